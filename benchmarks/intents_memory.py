@@ -0,0 +1,127 @@
+# Compares how much memory the bot's Discord cache uses under each intents profile.
+#
+# For each profile, a fresh process builds discord.py's connection state with the profile's intents and cache
+# settings, feeds it a guild with the given number of members (plus their presences, if the profile receives them)
+# and a stream of messages, and reports how much its resident size grew. Nothing connects to Discord.
+#
+# Usage: python benchmarks/intents_memory.py [--members 10000] [--messages 5000]
+
+# Python imports
+import argparse  # argparse, used for the command line options
+import gc  # gc, used to settle memory before measuring
+import json  # json, used to pass results from the child processes
+import os  # os, used to read the resident size
+import subprocess  # subprocess, used to measure each profile in its own process
+import sys  # sys, used to find the repository and start the child processes
+import tracemalloc  # tracemalloc, used to count the bytes Python allocated
+# Run from anywhere by putting the repository on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Discord related imports
+import discord
+from discord.state import ConnectionState
+# Importing my utility files
+from utils.intents import INTENTS_PROFILES, profile_options
+
+GUILD_ID = 1
+CHANNEL_ID = 10
+BOT_ID = 2
+
+
+# The resident size of this process in bytes (from /proc where it exists, otherwise the peak resident size)
+def resident_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def user_data(user_id: int) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "global_name": None, "discriminator": "0", "avatar": None}
+
+
+def member_data(user_id: int) -> dict:
+    return {"user": user_data(user_id), "roles": [], "joined_at": "2023-01-01T00:00:00+00:00",
+            "deaf": False, "mute": False, "flags": 0}
+
+
+def presence_data(user_id: int) -> dict:
+    return {"user": {"id": str(user_id)}, "status": "online", "client_status": {"desktop": "online"},
+            "activities": [{"name": "Politics and War", "type": 0}]}
+
+
+# A GUILD_CREATE payload with the given members (and their presences, if the profile receives them)
+def guild_data(members: int, presences: bool) -> dict:
+    user_ids = range(BOT_ID + 1, BOT_ID + 1 + members)
+    return {"id": str(GUILD_ID), "name": "Benchmark", "icon": None, "owner_id": str(BOT_ID + 1), "afk_timeout": 300,
+            "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+            "mfa_level": 0, "premium_tier": 0, "features": [], "emojis": [], "stickers": [], "large": True,
+            "member_count": members + 1, "unavailable": False,
+            "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                       "hoist": False, "managed": False, "mentionable": False}],
+            "channels": [{"id": str(CHANNEL_ID), "type": 0, "name": "general", "position": 0, "permission_overwrites": []}],
+            "members": [member_data(BOT_ID)] + [member_data(user_id) for user_id in user_ids],
+            "presences": [presence_data(user_id) for user_id in user_ids] if presences else []}
+
+
+# A MESSAGE_CREATE payload for a command sent by a member
+def message_data(message_id: int, user_id: int) -> dict:
+    member = member_data(user_id)
+    del member["user"]
+    return {"id": str(message_id), "channel_id": str(CHANNEL_ID), "guild_id": str(GUILD_ID), "author": user_data(user_id),
+            "member": member, "content": "!pnwfood 123456", "timestamp": "2023-01-01T00:00:00+00:00",
+            "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+
+# Measure one profile (run in a child process, so profiles never share memory)
+def measure(profile: str, members: int, messages: int) -> dict:
+    options = profile_options(profile)
+    state = ConnectionState(dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=None,
+                            intents=options["intents"], max_messages=options["max_messages"],
+                            member_cache_flags=options.get("member_cache_flags", discord.MemberCacheFlags.from_intents(options["intents"])),
+                            chunk_guilds_at_startup=options.get("chunk_guilds_at_startup", True))
+    state.user = discord.ClientUser(state=state, data=user_data(BOT_ID) | {"bot": True, "verified": True, "mfa_enabled": False})
+    # build the payloads first (and keep them until the end), so only what the cache keeps is measured
+    payload = guild_data(members, options["intents"].presences)
+    message_payloads = [message_data(1000 + index, BOT_ID + 1 + index % members) for index in range(messages)]
+    gc.collect()
+    before = resident_bytes()
+    tracemalloc.start()
+    guild = discord.Guild(data=payload, state=state)
+    state._add_guild(guild)
+    for data in message_payloads:
+        state.parse_message_create(data)
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resident = resident_bytes() - before
+    return {"profile": profile, "cached_members": len(guild.members), "cached_messages": len(state._messages or []),
+            "resident_bytes": resident, "allocated_bytes": allocated}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the Discord cache's memory use under each intents profile.")
+    parser.add_argument("--members", type=int, default=10000, help="members in the benchmark guild")
+    parser.add_argument("--messages", type=int, default=5000, help="messages sent in the benchmark guild")
+    parser.add_argument("--profile", choices=INTENTS_PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        print(json.dumps(measure(args.profile, args.members, args.messages)))
+        return
+    per = 10000 / args.members
+    print(f"{args.members} members, {args.messages} messages")
+    print(f"{'profile':<10}{'members':>10}{'messages':>10}{'resident MiB / 10k':>20}{'allocated MiB / 10k':>21}")
+    for profile in INTENTS_PROFILES:
+        output = subprocess.run([sys.executable, __file__, "--profile", profile, "--members", str(args.members),
+                                 "--messages", str(args.messages)], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        print(f"{profile:<10}{result['cached_members']:>10}{result['cached_messages']:>10}"
+              f"{result['resident_bytes'] * per / 2 ** 20:>20.2f}{result['allocated_bytes'] * per / 2 ** 20:>21.2f}")
+
+
+if __name__ == "__main__":
+    main()
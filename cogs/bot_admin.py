@@ -0,0 +1,260 @@
+# Python imports
+import time  # time library
+import asyncio  # asyncio, mainly used to read the other shards' stats without blocking
+import os  # os, mainly used to restart the bot
+import sys  # sys, mainly used to exit the program when shutting the bot off
+import typing  # typing, mainly used for command parameters
+# Discord related imports
+import discord
+from discord.ext import commands
+# Importing my utility files
+from shared import *  # the config and logs
+import shared  # for the !work clock, which has to outlive reloads
+from utils.utils import *  # general utility functions
+from utils.log_utils import *  # log writing functions
+from utils.metrics import *  # command stats
+from exceptions import *  # custom exceptions
+
+
+######################
+#                    #
+# BOT ADMIN COMMANDS #
+#                    #
+######################
+class BotAdmin(commands.Cog,
+               name="Bot Admin",
+               description="Commands for admins of the bot"):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    # Add a command to clear the logs
+    @commands.command(name="clearlog",
+                      help="Clears all of the logs associated with the bot",
+                      brief="Clears logs",
+                      usage="!clearlogs")
+    async def clear_log(self,
+                        ctx: commands.Context
+                        ) -> None:
+        # Clear the command log, along with any lines still waiting to be written
+        await LOG.clear()
+        # Clear the error log (and the structured command log) in a similar way
+        await ERROR_LOG.clear()
+        if COMMAND_LOG:
+            await COMMAND_LOG.clear()
+        # Send a message and log that the logs have been cleared
+        embed = discord.Embed(
+            title="Log Clear", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has cleared the logs.', color=0xFF5733)
+        LOG.write(
+            f'Admin {ctx.message.author} ({ctx.message.author.id}) has cleared the logs.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to search the structured command log
+    @commands.command(name="logsearch",
+                      help="Searches the command log for the most recent commands, optionally only those used by a user and/or in a guild",
+                      brief="Searches the command log",
+                      usage="!logsearch (user_id) (hours) (guild_id)")
+    async def log_search(self,
+                         ctx: commands.Context,
+                         user_id: typing.Optional[int] = commands.parameter(
+                             default=None, description="ID of the user whose commands to find"),
+                         hours: typing.Optional[float] = commands.parameter(
+                             default=24, description="How many hours back to search"),
+                         guild_id: typing.Optional[int] = commands.parameter(
+                             default=None, description="ID of the guild to find commands used in")
+                         ) -> None:
+        if COMMAND_LOG is None:
+            embed = discord.Embed(
+                title="No Command Log", description="There is no structured command log to search. Set COMMAND_LOG_DIRECTORY to keep one.", color=0xFF5733)
+            await attempt_send(ctx, embed)
+            return
+        began = time.perf_counter()
+        records = await COMMAND_LOG.search(user_id, guild_id, time.time() - hours * 3600)
+        searched = (time.perf_counter() - began) * 1000
+        lines = []
+        for record in records:
+            latency = "" if record["latency_ms"] is None else f', {record["latency_ms"]: ,.0f} ms'
+            lines.append(
+                f'{format_second(int(record["ts"]))} <@{record["user_id"]}> !{record["command"]} {" ".join(record["args"])} ({record["outcome"]}{latency})')
+        embed = discord.Embed(title="Command Log Search", description="\n".join(
+            lines) or "No commands found.", color=0xFF5733)
+        embed.set_footer(text=f"Searched in {searched: ,.1f} ms")
+        await attempt_send(ctx, embed)
+
+    # Add a command to show how long commands are taking
+    @commands.command(name="stats",
+                      help="Shows latency percentiles (total, rate limiter queue, API, compute, and send) and error counts for each command over the last hour",
+                      brief="Shows command stats",
+                      usage="!stats")
+    async def stats(self,
+                    ctx: commands.Context
+                    ) -> None:
+        # Include the other shard processes' stats, if there are any
+        others = await asyncio.to_thread(shared_stats.others) if shared_stats is not None else []
+        histograms, errors = command_stats.summary(others)
+        commands_used = sorted({command for command, _ in histograms} | set(errors))
+
+        def ms(seconds: float | None) -> str:
+            return "-" if seconds is None else f"{seconds * 1000: ,.0f}"
+        lines = []
+        for command in commands_used:
+            total = histograms.get((command, "total"), Histogram())
+            lines.append(f'**!{command}** ({total.count} uses, {errors.get(command, 0)} errors)\n' + "\n".join(
+                f'{phase.capitalize()}: p50 {ms(histogram.quantile(0.5))} / p95 {ms(histogram.quantile(0.95))} / p99 {ms(histogram.quantile(0.99))} ms'
+                for phase in PHASES if (histogram := histograms.get((command, phase))) is not None))
+        embed = discord.Embed(title="Command Stats (all shards)" if shared_stats is not None else "Command Stats", description="\n\n".join(
+            lines) or "No commands have been used yet.", color=0xFF5733)
+        await attempt_send(ctx, embed)
+
+    # Add a command to shut the bot off
+    @commands.command(name="shutoff",
+                      help="Shuts the bot off completly",
+                      brief="Shut bot off",
+                      usage="!shutoff")
+    async def shutoff(self,
+                      ctx: commands.Context
+                      ) -> None:
+        # Create an embed saying that the bot was shut off by this specific admin
+        embed = discord.Embed(
+            title="Bot Shutoff", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has shutoff the bot.', color=0xFF5733)
+        # Write to the log that the bot was shut off and send the embed
+        LOG.write(
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) shut the bot off.\n')
+        await attempt_send(ctx, embed)
+        # Close the bot (which stops the background tasks and writes everything out) and exit the program
+        await self.bot.close()
+        sys.exit()
+
+    # Add a command to restart the bot
+    @commands.command(name="restart",
+                      help="Shuts the bot off and then brings it back online",
+                      brief="Restarts bot",
+                      usage="!restart")
+    async def restart(self,
+                      ctx: commands.Context
+                      ) -> None:
+        # Create an embed saying that the bot was restart by this specific admin
+        embed = discord.Embed(
+            title="Bot Restart", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has restarted the bot.', color=0xFF5733)
+        # Write to the log that the bot was restart
+        LOG.write(
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) restarted the bot.\n')
+        # Send the embed
+        await attempt_send(ctx, embed)
+        # Close the bot, which stops the background tasks and writes everything out, so nothing is lost or left open
+        await self.bot.close()
+        # Re-execute this file to restart the bot
+        os.execv(sys.executable, ['python'] + sys.argv)
+
+    # Add a command to reload the cogs' code and the config without restarting the bot
+    @commands.command(name="reload",
+                      help="Reloads the code of one cog (or all of them) and the config, keeping the bot connected and its caches warm",
+                      brief="Reloads cogs",
+                      usage="!reload [cog]")
+    async def reload(self,
+                     ctx: commands.Context,
+                     cog: typing.Optional[str] = commands.parameter(
+                         default=None, description="Name of the cog (or its extension) to reload")
+                     ) -> None:
+        # Work out which extensions to reload: every one, or the one holding the named cog
+        if cog is None:
+            extensions = list(self.bot.extensions)
+        elif self.bot.get_cog(cog) is not None:
+            extensions = [self.bot.get_cog(cog).__module__]
+        elif f'cogs.{cog}' in self.bot.extensions:
+            extensions = [f'cogs.{cog}']
+        else:
+            embed = discord.Embed(
+                title="Cog Not Found", description=f'There is no loaded cog or extension named {cog}.', color=0xFF5733)
+            await attempt_send(ctx, embed)
+            return
+        # Re-read the config
+        reload_errors = config.load()
+        # Reload each extension (if one fails to load, discord.py keeps the old version of it)
+        reloaded = []
+        failed = []
+        for extension in extensions:
+            try:
+                await self.bot.reload_extension(extension)
+                reloaded.append(extension)
+            except commands.ExtensionError as inst:
+                failed.append(f'{extension} ({inst.__class__.__name__})')
+        description = f'Reloaded {", ".join(reloaded) or "no cogs"} and the config.'
+        if failed:
+            description += f'\nFailed to reload: {", ".join(failed)}'
+        if reload_errors:
+            description += f'\nErrors in the config: {", ".join(getattr(error, "message", str(error)) for error in reload_errors)}'
+        embed = discord.Embed(title="Reload", description=description, color=0xFF5733)
+        # Log that the cogs were reloaded and send the embed
+        LOG.write(
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) reloaded {", ".join(reloaded) or "no cogs"}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to add a server to the permitted list of servers
+    @commands.command(name="addserver",
+                      help="Add a server to the list of servers the bot can be used in",
+                      brief="Add a permitted server",
+                      usage="!addserver (guild_id)")
+    async def add_server(self,
+                         ctx: commands.Context,
+                         guild_id: typing.Optional[int] = commands.parameter(
+                             default=None, description="The ID of the guild to add")
+                         ) -> None:
+        # If the user does not specify a guild_id, then they want to add the server they used the command in
+        if guild_id is None:
+            guild_id = ctx.guild.id
+        # Add the guild, which fails if it is already a permitted guild
+        if not await config.add_guild(guild_id):
+            # Log and message telling that it is
+            embed = discord.Embed(
+                title="Already Permitted", description=f'Server {guild_id} is already an allowed server for bot commands.', color=0xFF5733)
+            LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to add server {guild_id}, but that server already has permission.\n')
+            await attempt_send(ctx, embed)
+            return
+        # Create an embed saying that the server was added successfully, log it, and send it
+        embed = discord.Embed(
+            title="Server Added", description=f"Admin {ctx.message.author} ({ctx.message.author.id}) has added the guild {guild_id} to the bot's permitted guilds.", color=0xFF5733)
+        LOG.write(
+            f"Admin {ctx.message.author} ({ctx.message.author.id}) has added the guild {guild_id} to the bot's permitted guilds.\n")
+        await attempt_send(ctx, embed)
+
+    # Add a command where I can try to keep track of how much time I spend working on the bot
+    @commands.command(name="work",
+                      help="Start or stop the clock of working on the bot.",
+                      usage="!work [start/stop]")
+    async def work(self,
+                   ctx: commands.Context,
+                   clock: str = commands.parameter(
+                       description="Whether or not to start or stop working")
+                   ) -> None:
+        # Get me (the first admin)
+        me = await self.bot.fetch_owner()
+        # If the clock status is start, then set the start time and message me saying I clocked in
+        if clock == "start":
+            shared.start_time = int(time.time())
+            await attempt_send(me, f"You've 'clocked in' to working on the bot.")
+        # Otherwise, if it is stop, the set the end time
+        elif clock == "stop":
+            end_time = int(time.time())
+            # Add the time worked to the total in the .env
+            await config.add_to("SECONDS_WORKED", end_time - shared.start_time)
+            # Message me letting me know I clocked out
+            await attempt_send(me, f"You've 'clocked out' to working on the bot.")
+
+    # Add a cog check that checks if the user of these commands is an admin
+    async def cog_check(self,
+                        ctx: commands.Context
+                        ) -> bool:
+        # If they're an admin, then it simply returns true
+        if config.is_admin(ctx.message.author.id):
+            return True
+        # Otherwise, it messages and logs that a non-admin tried to use the command before returning false
+        embed = discord.Embed(
+            title="Improper Access", description=f'User {ctx.message.author} ({ctx.message.author.id}) does not have permissions to run this command. Contact an Admin to resolve this issue.', color=0xFF5733)
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to use command {ctx.command}, but did not have proper access.\n')
+        await attempt_send(ctx, embed)
+        return False
+
+
+# Add the cog to the bot when the extension is loaded
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(BotAdmin(bot))
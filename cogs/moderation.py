@@ -0,0 +1,218 @@
+# Python imports
+import typing  # typing, mainly used for command parameters
+import asyncio  # asyncio, mainly used to moderate several members at once
+from os import getenv as ENV
+# Discord related imports
+import discord
+from discord.ext import commands
+# Importing my utility files
+from shared import *  # the config and logs
+from utils.utils import *  # general utility functions
+from utils.log_utils import stamp  # log timestamps
+from utils.metrics import timed  # command timing
+from exceptions import *  # custom exceptions
+
+
+################
+#              #
+# MOD COMMANDS #
+#              #
+################
+# Number of members a moderation command acts on at once. discord.py waits out Discord's rate limit for each
+# route by itself; this just keeps a mass action from piling hundreds of requests onto those limits at once.
+MODERATION_CONCURRENCY = int(ENV("MODERATION_CONCURRENCY") or 5)
+
+
+# The result of a moderation command: the members it was done to, the members it was skipped for (and why),
+# and the members it failed for (and why)
+class BulkResult(typing.NamedTuple):
+    done: list[discord.Member]
+    skipped: list[tuple[discord.Member, str]]
+    failed: list[tuple[discord.Member, str]]
+
+
+# A utility function to do a moderation action to several members at once. The action returns None when it
+# was done, or the reason it was skipped. Members mentioned more than once are only acted on once.
+async def bulk_action(members: list[discord.Member], action) -> BulkResult:
+    members = list(dict.fromkeys(members))
+    semaphore = asyncio.Semaphore(MODERATION_CONCURRENCY)
+
+    async def run(member: discord.Member) -> tuple[str, str | None]:
+        async with semaphore:
+            try:
+                skipped = await action(member)
+            except discord.Forbidden:
+                return "failed", "Missing permissions"
+            except discord.HTTPException as inst:
+                return "failed", inst.text or inst.__class__.__name__
+        return ("skipped", skipped) if skipped else ("done", None)
+    # the actions overlap, so they are timed together (timing each one would count the overlapping time more than once)
+    with timed("send"):
+        outcomes = await asyncio.gather(*(run(member) for member in members))
+    result = BulkResult([], [], [])
+    for member, (outcome, reason) in zip(members, outcomes):
+        if outcome == "done":
+            result.done.append(member)
+        else:
+            getattr(result, outcome).append((member, reason))
+    return result
+
+
+# A utility function to list members in an embed field, which can hold at most 1024 characters
+def member_field(lines: list[str]) -> str:
+    value = ""
+    for index, line in enumerate(lines):
+        more = f"...and {len(lines) - index} more"
+        if len(value) + len(line) + 1 + len(more) > 1024:
+            return value + more
+        value += f"{line}\n"
+    return value
+
+
+# A utility function to make one embed summing up a moderation command
+def bulk_summary(title: str, description: str, done_name: str, result: BulkResult) -> discord.Embed:
+    embed = discord.Embed(title=title, description=description, color=0xFF5733)
+    if result.done:
+        embed.add_field(name=f"{done_name} ({len(result.done)})", value=member_field(
+            [f"{member.name} ({member.id})" for member in result.done]), inline=False)
+    if result.skipped:
+        embed.add_field(name=f"Skipped ({len(result.skipped)})", value=member_field(
+            [f"{member.name} ({member.id}): {reason}" for member, reason in result.skipped]), inline=False)
+    if result.failed:
+        embed.add_field(name=f"Failed ({len(result.failed)})", value=member_field(
+            [f"{member.name} ({member.id}): {reason}" for member, reason in result.failed]), inline=False)
+    return embed
+
+
+# A utility function to log a moderation command
+def log_bulk(ctx: commands.Context, verb: str, result: BulkResult, reason: str = None) -> None:
+    line = f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !{ctx.command} command to {verb} {", ".join(f"{member.name} ({member.id})" for member in result.done) or "nobody"}'
+    if reason is not None:
+        line += f' for the reason "{reason}"'
+    if result.failed:
+        line += f', but it failed for {", ".join(f"{member.name} ({member.id}): {why}" for member, why in result.failed)}'
+    LOG.write(line + ".\n")
+
+
+class Moderation(commands.Cog,
+                 description="Moderation commands"):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    # Ban command for moderators to ban users
+    @commands.command(name="ban",
+                      help="Ban one or more user(s) with a specified reason",
+                      brief="Ban people",
+                      usage="!ban @Jacob @Wumpus Bad people")
+    @commands.has_permissions(ban_members=True)
+    async def ban(self,
+                  ctx: commands.Context,
+                  members: commands.Greedy[discord.Member] = commands.parameter(
+                      description="User(s) to ban"),
+                  *,
+                  reason: typing.Optional[str] = commands.parameter(
+                      default="No reason given", description="Reason for banning the user(s)")
+                  ) -> None:
+        if not members:
+            await attempt_send(ctx, "You must specify which members to ban.")
+            return
+
+        async def ban_member(member: discord.Member) -> None:
+            await member.ban(reason=reason)
+        result = await bulk_action(members, ban_member)
+        embed = bulk_summary("Wall of Bans", f'The following Discord users have joined the Wall of Bans of {ctx.guild.name} for the reason "{reason}".',
+                             "Banned", result)
+        log_bulk(ctx, "ban", result, reason)
+        await attempt_send(ctx, embed)
+
+    @commands.command(name="kick",
+                      help="Kick one or more user(s) with a specified reason",
+                      brief="Kick people",
+                      usage="!kick @Jacob @Wumpus Bad people")
+    @commands.has_permissions(kick_members=True)
+    async def kick(self,
+                   ctx: commands.Context,
+                   members: commands.Greedy[discord.Member] = commands.parameter(
+                       description="User(s) to kick"),
+                   *,
+                   reason: typing.Optional[str] = commands.parameter(
+                       default="No reason given", description="Reason for kicking the user(s)")
+                   ) -> None:
+        if not members:
+            await attempt_send(ctx, "You must specify which members to kick.")
+            return
+
+        async def kick_member(member: discord.Member) -> None:
+            await member.kick(reason=reason)
+        result = await bulk_action(members, kick_member)
+        embed = bulk_summary("Wall of Kicks", f'The following Discord users have joined the Wall of Kicks of {ctx.guild.name} for the reason "{reason}".',
+                             "Kicked", result)
+        log_bulk(ctx, "kick", result, reason)
+        await attempt_send(ctx, embed)
+
+    @commands.command(name="mute",
+                      help="Mute one or more user(s)",
+                      brief="Mute people",
+                      usage="!mute @Jacob @Wumpus")
+    @commands.has_permissions(moderate_members=True, manage_roles=True)
+    async def mute(self,
+                   ctx: commands.Context,
+                   members: commands.Greedy[discord.Member] = commands.parameter(
+                       description="User(s) to mute"),
+                   ) -> None:
+        if not members:
+            await attempt_send(ctx, "You must specify which members to mute.")
+            return
+        role = discord.utils.get(ctx.guild.roles, name="Muted")
+        if not role:
+            perms = discord.Permissions.none() or discord.Permissions(
+                read_messages=True, read_message_history=True)
+            role = await ctx.guild.create_role(name="Muted", permissions=perms, colour=discord.Colour(0x0062ff))
+
+        async def mute_member(member: discord.Member) -> str | None:
+            if role in member.roles:
+                return "Already muted"
+            await member.add_roles(role)
+        result = await bulk_action(members, mute_member)
+        embed = bulk_summary("Mute", f"Muted members in {ctx.guild.name}.", "Muted", result)
+        log_bulk(ctx, "mute", result)
+        await attempt_send(ctx, embed)
+
+    @commands.command(name="unmute",
+                      help="Unmute one or more user(s)",
+                      brief="Unmute people",
+                      usage="!unmute @Jacob @Wumpus")
+    @commands.has_permissions(moderate_members=True, manage_roles=True)
+    async def unmute(self,
+                     ctx: commands.Context,
+                     members: commands.Greedy[discord.Member] = commands.parameter(
+                         description="User(s) to unmute"),
+                     ) -> None:
+        if not members:
+            await attempt_send(ctx, "You must specify which members to unmute.")
+            return
+        role = discord.utils.get(ctx.guild.roles, name="Muted")
+        if not role:
+            await attempt_send(ctx, f'Cannot unmute a member when the Muted role does not exist yet.')
+            return
+
+        async def unmute_member(member: discord.Member) -> str | None:
+            if role not in member.roles:
+                return "Does not have the Muted role"
+            await member.remove_roles(role)
+        result = await bulk_action(members, unmute_member)
+        embed = bulk_summary("Unmute", f"Unmuted members in {ctx.guild.name}.", "Unmuted", result)
+        log_bulk(ctx, "unmute", result)
+        await attempt_send(ctx, embed)
+
+    # Add cog check that simply calls the general_tasks utility function to check a few things
+
+    async def cog_check(self,
+                        ctx: commands.Context
+                        ) -> bool:
+        return await generic_tasks(LOG, ctx, config.allowed_guilds)
+
+
+# Add the cog to the bot when the extension is loaded
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Moderation(bot))
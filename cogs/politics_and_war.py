@@ -0,0 +1,365 @@
+# Python imports
+import typing  # typing, mainly used for command parameters
+import math  # math, mainly used to count pages
+# Discord related imports
+import discord
+from discord.ext import commands
+# Importing my utility files
+from shared import *  # the config and logs
+import utils.pnw_utils as pnw  # pnw utility functions
+from utils.utils import *  # general utility functions
+from utils.log_utils import stamp  # log timestamps
+from exceptions import *  # custom exceptions
+
+
+#############################
+#                           #
+# POLITICS AND WAR COMMANDS #
+#                           #
+#############################
+class PoliticsandWar(commands.Cog,
+                     name="Politics and War",
+                     description="All commands related to the Politics and War browser game."):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    ########################
+    # CALCULATION COMMANDS #
+    ########################
+
+    # Add a command to calculate the cost of infrastructure
+    @commands.command(name='pnwinfra',
+                      help="Calculates the cost to go from one level of infrastructure to another, optionally for a specific nation.",
+                      brief="Calculates cost of infrastrucutre.",
+                      usage="!pnwinfra start end (nation_id)")
+    async def calc_infra(self,
+                         ctx: commands.Context,
+                         start: float = commands.parameter(
+                             description="Starting infrastructure level"),
+                         end: float = commands.parameter(
+                             description="Ending instrastructure level"),
+                         nation_id: typing.Optional[int] = commands.parameter(
+                             default=None, description="ID of the nation to calculate for")
+                         ) -> None:
+        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
+        if nation_id is None:
+            infra_cost = pnw.infra_value(start, end)
+            embed = discord.Embed(title="Calculate Infrastructure Cost",
+                                  description=f'The cost to go from {start} to {end} is:\n${infra_cost: ,.2f}', color=0xFF5733)
+        # Otherwise, calculate it with their specific info
+        else:
+            # Get the infra query result
+            result = await pnw.get_query("infraland", nation_id)
+            infra_cost = pnw.calc_infra_cost(start, end, result)
+            embed = discord.Embed(title="Calculate Infrastructure Cost",
+                                  description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${infra_cost: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the created embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwinfra command.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to calculate the cost of infrastructure
+    @commands.command(name='pnwland',
+                      help="Calculates the cost to go from one level of land to another, optionally for a specific nation.",
+                      brief="Calculates cost of land.",
+                      usage="!pnwland start end (nation_id)")
+    async def calc_land(self,
+                        ctx: commands.Context,
+                        start: float = commands.parameter(
+                            description="Starting land level"),
+                        end: float = commands.parameter(
+                            description="Ending land level"),
+                        nation_id: typing.Optional[int] = commands.parameter(
+                            default=None, description="ID of the nation to calculate for")
+                        ) -> None:
+        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
+        if nation_id is None:
+            land_cost = pnw.land_value(start, end)
+            embed = discord.Embed(
+                title="Calculate Land Cost", description=f'The cost to go from {start} to {end} is:\n${land_cost: ,.2f}', color=0xFF5733)
+        # Otherwise, calculate it with their specific info
+        else:
+            # Get the infra query result
+            result = await pnw.get_query("infraland", nation_id)
+            land_cost = pnw.calc_land_cost(start, end, result)
+            embed = discord.Embed(
+                title="Calculate Land Cost", description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${land_cost: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the created embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwland command.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to calculate the cost to go from one city to another city
+    @commands.command(name='pnwcity',
+                      help="Calculates the cost to go from one city to another, optionally for a specific nation.",
+                      brief="Calculates the cost of cities.",
+                      usage="!pnwcity start end (nation_id)")
+    async def calc_city(self,
+                        ctx: commands.Context,
+                        start: int = commands.parameter(
+                            description="Starting city level"),
+                        end: int = commands.parameter(
+                            description="Ending city level"),
+                        nation_id: typing.Optional[int] = commands.parameter(
+                            default=None, description="ID of the nation to calculate for")
+                        ) -> None:
+        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
+        if nation_id is None:
+            city_cost = pnw.calc_city_cost(start, end)
+            embed = discord.Embed(
+                title="Calculate City Cost", description=f'The cost to go from {start} to {end} is:\n${city_cost: ,.2f}', color=0xFF5733)
+        # Otherwise, calculate it with their specific info
+        else:
+            # Get the city query result
+            result = await pnw.get_query("city", nation_id)
+            city_cost = pnw.calc_city_cost(start, end, result)
+            embed = discord.Embed(
+                title="Calculate City Cost", description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${city_cost: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the created embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwcity command.\n')
+        await attempt_send(ctx, embed)
+
+    ####################
+    # REVENUE COMMANDS #
+    ####################
+
+    # Add a command to calculate food revenue (usage, production, and net revenue) of a nation
+    # Users may find a very small margin of error. This is being attributed to constantly fluctuating radiation in Orbis.
+
+    @commands.command(name="pnwfood",
+                      help="Calculates the food usage, production, and net revenue for a nation.",
+                      brief="Calculates food stats for a nation.",
+                      usage="!pnwfood nation_id")
+    async def calc_food(self,
+                        ctx: commands.Context,
+                        nation_id: int = commands.parameter(
+                            description="ID of the nation to calculate for")
+                        ) -> None:
+        # Get the food query result
+        result = await pnw.get_query("food", nation_id)
+        # Call the food calculation function
+        net_food, food_production, food_usage = await pnw.calc_food_rev(result)
+        embed = discord.Embed(
+            title="Food Statistics", description=f'Statistics about food revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {abs(food_production): ,.2f}\nUsage: {food_usage: ,.2f}\nNet: {net_food: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the created embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwfood command with id {nation_id}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to calculate revenue (usage, production, and net revenue) for any raw resource of a nation
+    @commands.command(name="pnwraw",
+                      help="Calculates the raw's usage, production, and net revenue for a nation.",
+                      brief="Calculates raw stats for a nation.",
+                      usage="!pnwraw nation_id resource")
+    async def calc_raw(self,
+                       ctx: commands.Context,
+                       nation_id: int = commands.parameter(
+                           description="ID of the nation to calculate for"),
+                       resource: str = commands.parameter(
+                           default="all", description="Raw resource to calculate the revenue for")
+                       ) -> None:
+        # Do anything we need to related to resources
+        # May get rid of utility function unless I need it for manufactured command and others
+        result, flag = await resource_tasks(nation_id, ctx)
+        if flag:
+            return
+        # Call the calculation function
+        if resource.lower() == "all":
+            # Calculate every resource at once and keep the raw ones
+            revenue = pnw.calc_all_rev(result)
+            resources = {resource: revenue[resource] for resource in ["coal", "oil", "iron", "lead", "bauxite", "uranium"]}
+            embed = discord.Embed(title="All Raw Resource Statistics", description="\n".join(
+                f'{"**" + key.capitalize() + "**"}\nProduction: {value[1]: ,.2f}\nUsage: {abs(value[2]): ,.2f}\nNet: {value[0]: ,.2f}\n' for key, value in resources.items()), color=0xFF5733)
+        else:
+            try:
+                net, production, usage = pnw.calc_raw_rev(
+                    result, resource.lower())
+            except InvalidResourceException as inst:
+                embed = discord.Embed(
+                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
+                await attempt_send(ctx, embed)
+                return
+            embed = discord.Embed(title=f"{resource.capitalize()} Statistics",
+                                  description=f'Statistics about {resource.lower()} revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {abs(production): ,.2f}\nUsage: {usage: ,.2f}\nNet: {net: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the generated embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwraw command with id {nation_id} and resource {resource.lower()}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to calculate revenue (usage, production, and net revenue) for any manufactured resource of a nation
+    @commands.command(name="pnwmanu",
+                      help="Calculates the manufactured's usage, production, and net revenue for a nation.",
+                      brief="Calculates manufactured stats for a nation.",
+                      usage="!pnwmanu nation_id resource")
+    async def calc_manu(self,
+                        ctx: commands.Context,
+                        nation_id: int = commands.parameter(
+                            description="ID of the nation to calculate for"),
+                        resource: str = commands.parameter(
+                            default="all", description="Manufactured resource to calculate the revenue for")
+                        ) -> None:
+        # Do anything we need to related to resources
+        # May get rid of utility function unless I need it for manufactured command and others
+        result, flag = await resource_tasks(nation_id, ctx)
+        if flag:
+            return
+        # Call the calculation function
+        if resource.lower() == "all":
+            # Calculate every resource at once and keep the production of the manufactured ones
+            revenue = pnw.calc_all_rev(result)
+            resources = {resource: revenue[resource][1] for resource in ["steel", "aluminum", "gasoline", "munitions"]}
+            embed = discord.Embed(title="All Manufactured Resource Statistics", description="\n".join(
+                f'{"**" + key.capitalize() + "**"}\nProduction: {value: ,.2f}\nUsage: {0: ,.2f}\nNet: {value: ,.2f}\n' for key, value in resources.items()), color=0xFF5733)
+        else:
+            try:
+                production = pnw.calc_manu_rev(result, resource.lower())
+            except InvalidResourceException as inst:
+                embed = discord.Embed(
+                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
+                await attempt_send(ctx, embed)
+                return
+            embed = discord.Embed(title=f"{resource.capitalize()} Statistics",
+                                  description=f'Statistics about {resource.lower()} revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {production: ,.2f}\nUsage: {0: ,.2f}\nNet: {production: ,.2f}', color=0xFF5733)
+        # Log the command usage and send the generated embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwmanu command with id {nation_id} and resource {resource.lower()}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to calculate revenue (usage, production, and net revenue) for every resource of a nation at once
+    @commands.command(name="pnwrev",
+                      help="Calculates the usage, production, and net revenue of every resource for a nation.",
+                      brief="Calculates all resource stats for a nation.",
+                      usage="!pnwrev nation_id")
+    async def calc_rev(self,
+                       ctx: commands.Context,
+                       nation_id: int = commands.parameter(
+                           description="ID of the nation to calculate for")
+                       ) -> None:
+        # Get everything needed for every resource in a single query
+        result = await pnw.get_query("revenue", nation_id)
+        net_food, food_production, food_usage = await pnw.calc_food_rev(result)
+        resources = {"food": (net_food, food_production, food_usage)}
+        resources.update(pnw.calc_all_rev(result))
+        embed = discord.Embed(title="Resource Statistics", description=f'Statistics about resource revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\n' + "\n".join(
+            f'{"**" + key.capitalize() + "**"}\nProduction: {value[1]: ,.2f}\nUsage: {abs(value[2]): ,.2f}\nNet: {value[0]: ,.2f}\n' for key, value in resources.items()), color=0xFF5733)
+        # Log the command usage and send the generated embed
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwrev command with id {nation_id}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add a command to report food, raw, manufactured, and city/infra figures for every member of an alliance
+    @commands.command(name="pnwalliance",
+                      help="Reports the revenue and city/infrastructure figures of every member of an alliance.",
+                      brief="Reports stats for an alliance.",
+                      usage="!pnwalliance alliance_id")
+    async def alliance(self,
+                       ctx: commands.Context,
+                       alliance_id: int = commands.parameter(
+                           description="ID of the alliance to report on")
+                       ) -> None:
+        # Fetch every member (a page of up to 500 per API call) and calculate their figures
+        try:
+            reports = await pnw.alliance_report(alliance_id)
+        except NoAllianceFoundException as inst:
+            embed = discord.Embed(
+                title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
+            await attempt_send(ctx, embed)
+            return
+        # Start with a summary of the whole alliance
+        food = sum(report.food for report in reports)
+        raw = {resource: sum(report.raw[resource] for report in reports) for resource in pnw.RAW_INFO}
+        manu = {resource: sum(report.manu[resource] for report in reports) for resource in pnw.MANU_INFO}
+        pages = math.ceil(len(reports) / 20)
+        embed = discord.Embed(title=f"Alliance {alliance_id} Summary", description=f'Members: {len(reports)}\nCities: {sum(report.cities for report in reports): ,d}\nInfrastructure: {sum(report.infrastructure for report in reports): ,.2f}\n\n**Net Revenue**\nFood: {food: ,.2f}\n' + "\n".join(
+            f'{key.capitalize()}: {value: ,.2f}' for key, value in (raw | manu).items()), color=0xFF5733)
+        await attempt_send(ctx, embed)
+        # Then list the members, 20 to a page
+        for page in range(pages):
+            embed = discord.Embed(title=f"Alliance {alliance_id} Members", description="\n".join(
+                f'[{report.nation_name}](https://politicsandwar.com/nation/id={report.nation_id}): {report.cities} cities, {report.infrastructure: ,.0f} infra, {report.food: ,.2f} food/day, next city ${report.next_city_cost: ,.0f}' for report in reports[page * 20:(page + 1) * 20]), color=0xFF5733)
+            embed.set_footer(text=f"Page {page + 1}/{pages}")
+            await attempt_send(ctx, embed)
+        # Log the command usage
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !pnwalliance command with id {alliance_id}.\n')
+
+    @commands.command(name="treasures",
+                      enabled=False)
+    async def treasures(self,
+                        ctx):
+        result = await pnw.get_query("treasure")
+        greens = [treasure for treasure in result.treasures if (
+            treasure.color == "green" or treasure.color == "any")]
+        for treasure in greens:
+            print(treasure.color)
+
+    @commands.command(name="pnwmarket",
+                      help="Returns the lowest sell offer and highest buy offer for a given resource.",
+                      brief="Returns market information for a resource.",
+                      usage="!pnwmarket resource")
+    async def market_info(self,
+                          ctx: commands.Context,
+                          resource: str = commands.parameter(
+                              default="all", description="Resource to get the market information for")
+                          ) -> None:
+        # Answer from the market poller's snapshot if it has a recent one
+        poller = pnw.market_poller
+        use_snapshot = poller.is_fresh()
+        if resource.lower() == "all":
+            # Otherwise get the prices of every resource in a single API call
+            resources = poller.prices() if use_snapshot else await pnw.market_overview()
+            embed = discord.Embed(title="All Market Information", description="\n".join(
+                f'{"**" + key.capitalize() + "**"}\nLowest Sell Offer: {format_price(value.low_sell)}\nHighest Buy Offer: {format_price(value.high_buy)}\n' for key, value in resources.items()), color=0xFF5733)
+        else:
+            try:
+                if use_snapshot:
+                    prices = poller.prices([resource.lower()])[resource.lower()]
+                    high_buy, low_sell = prices.high_buy, prices.low_sell
+                else:
+                    high_buy, low_sell = await pnw.market_info(resource.lower())
+            except InvalidResourceException as inst:
+                embed = discord.Embed(
+                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
+                await attempt_send(ctx, embed)
+                return
+            embed = discord.Embed(title=f'{resource.capitalize()} Market Information',
+                                  description=f'Lowest Sell Offer: {format_price(low_sell)}\nHighest Buy Offer: {format_price(high_buy)}')
+        if use_snapshot:
+            embed.set_footer(text=f"Prices as of {poller.age():.0f} seconds ago")
+        await attempt_send(ctx, embed)
+
+    #################
+    # USER COMMANDS #
+    #################
+
+    # WIP command to display user's Politics and War information
+
+    @commands.command(name="mypnwinfo",
+                      enabled=False)
+    async def my_info(self,
+                      ctx: commands.Context,
+                      nation_id: int = commands.parameter(
+                          description="ID of the nation whose information is to be displayed"),
+                      api_key: typing.Optional[str] = commands.parameter(
+                          default=None, description="User's API key, used to access their personal information for display")
+                      ) -> None:
+        await ctx.message.delete()
+        # If they specified an API key, then they want to display sensitive information
+        if api_key is not None:
+            result = await pnw.get_query("my_info", nation_id, api_key)
+            nation = result.nations[0]
+            embed = discord.Embed(
+                title=f'Info for {nation.nation_name}', description=f'Military\nSoldiers: {nation.soldiers}\nTanks: {nation.tanks}\nAircraft: {nation.aircraft}\nShips: {nation.ships}', color=0xFF5733)
+        # Otherwise, they only want to display non-sensitive information
+        else:
+            result = await pnw.get_query("my_info", nation_id)
+            nation = result.nations[0]
+            embed = discord.Embed(
+                title=f'Info for {nation.nation_name}', description=f'Military\nSoldiers: {nation.soldiers}\nTanks: {nation.tanks}\nAircraft: {nation.aircraft}\nShips: {nation.ships}', color=0xFF5733)
+        # Log the command usage
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) used the !mypnwinfo command with id {nation_id}.\n')
+        await attempt_send(ctx, embed)
+
+    # Add cog check that simply calls the general_tasks utility function to check a few things
+    async def cog_check(self,
+                        ctx: commands.Context
+                        ) -> bool:
+        return await generic_tasks(LOG, ctx, config.allowed_guilds)
+
+
+# Add the cog to the bot when the extension is loaded
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(PoliticsandWar(bot))
@@ -59,3 +59,86 @@ class NoKeyException(Exception):
         super().__init__(self.message)
 
     pass
+
+
+class APITimeoutException(Exception):
+    "Exception raised when a request to the Politics and War API takes too long."
+
+    def __init__(self, timeout: float) -> None:
+        self.name = "APITimeoutException"
+        self.message = f"The Politics and War API did not respond within {timeout:g} seconds."
+        super().__init__(self.message)
+
+    pass
+
+
+class APIErrorException(Exception):
+    """Exception raised when the Politics and War API returns an error for a query.
+
+      Attributes:
+          error -- error message returned by the API
+      """
+
+    def __init__(self, error: str) -> None:
+        self.name = "APIErrorException"
+        self.message = f"The Politics and War API returned an error: {error}"
+        super().__init__(self.message)
+
+    pass
+
+
+class NoAllianceFoundException(Exception):
+    """Exception raised when no alliance members are found with a given alliance id number.
+
+      Attributes:
+          id -- id number which caused the error
+      """
+
+    def __init__(self, id: int) -> None:
+        self.name = "NoAllianceFoundException"
+        self.message = f"No alliance with members exists with alliance id {id}."
+        super().__init__(self.message)
+
+    pass
+
+
+class RateLimitedException(Exception):
+    "Exception raised when too many Politics and War API calls are already waiting to be sent."
+
+    def __init__(self) -> None:
+        self.name = "RateLimitedException"
+        self.message = "Too many Politics and War requests are waiting right now. Please try again in a minute."
+        super().__init__(self.message)
+
+    pass
+
+
+class QuotaExceededException(Exception):
+    """Exception raised when a personal API key has used up its daily Politics and War requests.
+
+      Attributes:
+          quota -- number of requests the key can make each day
+      """
+
+    def __init__(self, quota: int) -> None:
+        self.name = "QuotaExceededException"
+        self.message = f"Your API key has used all {quota} of its requests for today. Please try again tomorrow."
+        super().__init__(self.message)
+
+    pass
+
+
+class LevelTooHighException(Exception):
+    """Exception raised when a level is too high (or low) to be priced.
+
+      Attributes:
+          level -- level which caused the error
+          maximum -- highest level that can be priced
+      """
+
+    def __init__(self, level: float, maximum: int) -> None:
+        self.name = "LevelTooHighException"
+        self.message = f"{level:g} is out of range. Only levels between -{maximum:,} and {maximum:,} can be priced."
+        super().__init__(self.message)
+
+    pass
@@ -1,54 +1,101 @@
 # Python imports
 import time  # time library
-import os  # os, mainly used to restart the bot
+# Record when the bot started, so that the time it takes to start up can be measured
+STARTUP_BEGAN = time.perf_counter()
 import sys  # sys, mainly used to exit the program when shutting the bot off
-import typing  # typing, mainly used for command parameters
-# ENV related imports
-from dotenv import load_dotenv
+import asyncio  # asyncio, mainly used to run background tasks
+import signal  # signal, used to close properly when the process is asked to stop
+import contextlib  # contextlib, used to wait for cancelled tasks to finish
 from os import getenv as ENV
-# Path related imports
 from os.path import join, dirname
+from dotenv import load_dotenv
+# In multi mode, the first process only starts one process per group of shards and waits on them,
+# so it does that before the bot (or anything it uses) is set up
+from utils.sharding import launch_if_multi
+load_dotenv(join(dirname(__file__), '.env'))
+launch_if_multi(__file__)
 # Discord related imports
 import discord
 from discord.ext import commands
 # Importing my utility files
+from shared import *  # the config and logs, shared with the cogs (also loads the env)
 import utils.pnw_utils as pnw  # pnw utility functions
 from utils.utils import *  # general utility functions
+from utils.log_utils import *  # log writing functions
+from utils.metrics import *  # command timing and stats
+from utils.intents import profile_options  # intents and caching settings
 from exceptions import *  # custom exceptions
 
-# Initialize the bot with a set prefix of ! and all possible Intents
-bot = commands.Bot(command_prefix='!', intents=discord.Intents.all())
-
-errors: list[Exception] = []
+# The extensions holding the bot's cogs
+EXTENSIONS = ["cogs.politics_and_war", "cogs.moderation", "cogs.bot_admin"]
+
+
+# The bot, which sets everything up once before connecting, and stops its background tasks
+# and writes everything out whenever it closes
+# (in auto and multi mode it runs several shards, each with its own gateway connection)
+class KnoxBot(commands.Bot if SHARD_MODE == "single" else commands.AutoShardedBot):
+    # me (the first admin), once fetched
+    owner_user: discord.User = None
+    # the PnW API self-check, kept so it isn't garbage collected while it runs
+    self_check_task: asyncio.Task = None
+    # closing after a SIGTERM, kept for the same reason
+    close_task: asyncio.Task = None
+    # whether the shutdown tasks have run, so closing more than once (like !shutoff and then a SIGTERM) only runs them once
+    shut_down = False
+
+    # Called once, after logging in but before connecting to the gateway (unlike on_ready, which can run again)
+    async def setup_hook(self) -> None:
+        # Close properly (writing everything out) when the process is asked to stop, like the multi mode launcher does.
+        # Ctrl-C is already handled by discord.py, which closes the bot too.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.close_soon)
+        await startup_tasks()
+
+    def close_soon(self) -> None:
+        if self.close_task is None:
+            self.close_task = asyncio.create_task(self.close())
+
+    async def close(self) -> None:
+        # if something couldn't be opened at startup, there is nothing to stop or write out
+        if not errors and not self.shut_down:
+            self.shut_down = True
+            await shutdown_tasks()
+        await super().close()
+
+    # Get me (I'm always the first admin), who gets sent errors, or None if there are no admins.
+    # I'm fetched from the API once and kept, since the user cache may never hold me (it doesn't with the minimal profile).
+    async def fetch_owner(self) -> discord.User | None:
+        if config.owner is None:
+            return None
+        if self.owner_user is None or self.owner_user.id != config.owner:
+            self.owner_user = await self.fetch_user(config.owner)
+        return self.owner_user
+
+
+# The shards this process runs: in auto mode, all of them (discord.py picks how many unless SHARD_COUNT is given),
+# and in multi mode, the ones the launcher gave it
+shard_options = {}
+if SHARD_MODE == "auto" and SHARD_COUNT:
+    shard_options = {"shard_count": SHARD_COUNT}
+elif SHARD_MODE == "multi" and SHARD_IDS is not None:
+    shard_options = {"shard_ids": SHARD_IDS, "shard_count": SHARD_COUNT}
+
+# Initialize the bot with a set prefix of ! and the intents and caches of the chosen profile
+bot = KnoxBot(command_prefix='!', **profile_options(INTENTS_PROFILE, MESSAGE_CACHE_SIZE), **shard_options)
 
-# Load the env from its path
-dotenv_path = join(dirname(__file__), '.env')
-load_dotenv(dotenv_path)
 # Get important info from the env
 TOKEN = ENV("DISCORD_TOKEN")
 if not TOKEN or TOKEN == '':
     raise NoTokenException()
-try:
-    LOG = open(ENV('LOG_DIRECTORY'), "a")
-except OSError as inst:
-    inst.message = "Could not open LOG."
-    errors.append(inst)
-    pass
-except TypeError as inst:
-    inst.message = "No file provided for LOG."
-    errors.append(inst)
-    pass
-try:
-    ERROR_LOG = open(ENV('ERROR_LOG_DIRECTORY'), "a")
-except OSError as inst:
-    inst.message = "Could not open ERROR_LOG."
-    errors.append(inst)
-    pass
-except TypeError as inst:
-    inst.message = "No file provided for ERROR_LOG."
-    errors.append(inst)
-    pass
-start_time = 0
+# Address of the local metrics endpoint (it is only served if a port is given)
+METRICS_HOST = ENV('METRICS_HOST') or "127.0.0.1"
+METRICS_PORT = int(ENV('METRICS_PORT') or 0)
+# How many seconds the bot took to start up (set the first time it is ready)
+startup_seconds: float = None
+# When the gateway connection was lost (None while connected), and how long getting it back has taken
+disconnected_at: float = None
+reconnect_times = Histogram()
+# Whether to check that the PnW API can be reached once the bot is ready
+PNW_SELF_CHECK = ENV("PNW_SELF_CHECK", "1") != "0"
 
 
 ##############
@@ -58,41 +105,210 @@ start_time = 0
 ##############
 
 
-# Event for when the bot is ready
-@bot.event
-async def on_ready() -> None:
-    global admins, allowed_guilds
-    admins = []
-    allowed_guilds = []
-    # Call the start function to intialize the global admin and allowed_guilds variables
-    admins, allowed_guilds, start_errors = start(dotenv_path)
-    for error in start_errors:
+# Fill in a page of Prometheus metrics about the bot
+def collect_metrics(page: PrometheusPage) -> None:
+    # Commands, labelled with the cog they belong to
+    def labels(command: str, **extra: str) -> dict[str, str]:
+        cmd = bot.get_command(command)
+        return {"cog": cmd.cog_name if cmd and cmd.cog_name else "None", "command": command} | extra
+    page.histogram("knoxbot_command_duration_seconds", "Time taken by commands, split into phases (total, queue, api, compute, send).",
+                   [(labels(command, phase=phase), histogram) for (command, phase), histogram in command_stats.lifetime.histograms.items()])
+    page.value("knoxbot_command_errors_total", "counter", "Commands that ended in an error.",
+               [(labels(command), count) for command, count in command_stats.lifetime.errors.items()])
+    # The PnW API and its caches
+    page.histogram("knoxbot_pnw_api_duration_seconds", "Time taken by calls to the PnW API.", [({}, pnw.client.latency)])
+    page.value("knoxbot_pnw_api_errors_total", "counter", "Calls to the PnW API that failed.", [({}, pnw.client.errors)])
+    page.value("knoxbot_cache_hits_total", "counter", "Lookups answered from a cache.",
+               [({"cache": "game_info"}, pnw.game_info_cache.hits), ({"cache": "nation"}, pnw.nation_cache.hits)])
+    page.value("knoxbot_cache_misses_total", "counter", "Lookups that had to go to the PnW API.",
+               [({"cache": "game_info"}, pnw.game_info_cache.misses), ({"cache": "nation"}, pnw.nation_cache.misses)])
+    page.value("knoxbot_pnw_rate_limit_queue_depth", "gauge", "Calls to the PnW API waiting for the rate limiter.",
+               [({}, pnw.rate_limiter.queue_depth())])
+    page.value("knoxbot_pnw_rate_limited_total", "counter", "Calls to the PnW API turned away because the queue was full.",
+               [({}, pnw.rate_limiter.rejected)])
+    page.value("knoxbot_pnw_pooled_keys", "gauge", "Personal API keys in the key pool.", [({}, len(pnw.key_pool.kits))])
+    page.value("knoxbot_pnw_key_requests_today", "gauge", "Requests made today with each personal API key (by hashed key).",
+               [({"key": key}, requests) for key, requests in pnw.key_pool.requests_today().items()])
+    page.value("knoxbot_queries_total", "counter", "Calls to get_query and market_overview.", [({}, pnw.query_flight.calls)])
+    page.value("knoxbot_queries_coalesced_total", "counter", "Queries answered by an identical query already in flight.",
+               [({}, pnw.query_flight.coalesced)])
+    # The event loop, gateway, and Discord caches
+    page.histogram("knoxbot_event_loop_lag_seconds", "How late the event loop wakes up from a sleep.", [({}, loop_lag.histogram)])
+    page.histogram("knoxbot_gateway_reconnect_seconds", "Time taken to resume (or replace) the gateway session after losing it.",
+                   [({}, reconnect_times)])
+    page.value("knoxbot_gateway_latency_seconds", "gauge", "Latency between a heartbeat and its acknowledgement.", [({}, bot.latency)])
+    page.value("knoxbot_guilds", "gauge", "Guilds the bot is in.", [({}, len(bot.guilds))])
+    page.value("knoxbot_cached_members", "gauge", "Members in the member cache.", [({}, sum(len(guild.members) for guild in bot.guilds))])
+    page.value("knoxbot_cached_users", "gauge", "Users in the user cache.", [({}, len(bot.users))])
+    # The logs
+    page.value("knoxbot_log_queue_depth", "gauge", "Log lines waiting to be written.",
+               [({"log": "command"}, LOG.queue_depth()), ({"log": "error"}, ERROR_LOG.queue_depth())] +
+               ([({"log": "structured"}, COMMAND_LOG.queue_depth())] if COMMAND_LOG else []))
+
+
+metrics_exporter = MetricsExporter(collect_metrics, METRICS_HOST, METRICS_PORT)
+
+
+# Stop the background tasks, close the API client's session, and write out the logs and stats
+# (used when the bot shuts off or restarts)
+async def shutdown_tasks() -> None:
+    if bot.self_check_task is not None:
+        bot.self_check_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await bot.self_check_task
+    await pnw.market_poller.stop()
+    await pnw.client.close()
+    if pnw.disk_cache is not None:
+        await pnw.disk_cache.close()
+    await LOG.close()
+    await ERROR_LOG.close()
+    if COMMAND_LOG:
+        await COMMAND_LOG.close()
+    if STATS_PATH:
+        command_stats.save(STATS_PATH)
+    await metrics_exporter.stop()
+    if shared_stats is not None:
+        await shared_stats.close(command_stats)
+
+
+# Check that the PnW API can be reached without holding the bot up, and let me know if it can't
+async def pnw_self_check() -> None:
+    try:
+        seconds = await pnw.self_check()
+        print(f"PnW API self-check passed in {seconds:.2f} seconds.")
+    except Exception as inst:
+        print(f"PnW API self-check failed: {inst.__class__.__name__} {getattr(inst, 'message', inst)}")
+        me = await bot.fetch_owner()
+        if me is not None:
+            await attempt_send(me, f"The PnW API self-check failed: {inst.__class__.__name__}\n{getattr(inst, 'message', inst)}")
+
+
+# Set everything up once, before the bot connects: the config, the cogs, the PnW caches, and the background tasks
+async def startup_tasks() -> None:
+    # Read the admins and allowed guilds from the .env
+    for error in config.load():
         errors.append(error)
     if errors:
-        if admins:
-            me = bot.get_user(admins[0])
+        if config.owner is not None:
+            me = await bot.fetch_owner()
             for error in errors:
                 await attempt_send(me, f"There has been an error: {error.__class__.__name__}\n{error.message}")
         else:
             raise errors[0]
         await bot.close()
         sys.exit()
-    # Tell what guilds (servers) the bot is currently in, just because (might delete later)
-    print(f'{bot.user} is connected to the following guilds:')
-    for guild in bot.guilds:
-        print(f'{guild.name} (id: {guild.id})')
-    # Add all of the cog classes to the bot, so commands can be used and categorized in !help
+    # Load all of the cog extensions, so commands can be used and categorized in !help
     try:
-        await bot.add_cog(PoliticsandWar(bot))
-        await bot.add_cog(Moderation(bot))
-        await bot.add_cog(BotAdmin(bot))
+        for extension in EXTENSIONS:
+            await bot.load_extension(extension)
     except Exception as inst:
-        me: discord.User = bot.get_user(admins[0])
+        me = await bot.fetch_owner()
         await attempt_send(me, f"There has been an error: {inst.__class__.__name__}\n{', '.join(inst.args)}")
         await bot.close()
         sys.exit()
+    # Fill the PnW caches with what was saved before the last restart
+    if pnw.disk_cache is not None:
+        await pnw.warm_caches()
+        pnw.disk_cache.start()
+    # Start keeping the market snapshot up to date (does nothing if the poller is turned off).
+    # Only the process running shard 0 polls the API; the other shard processes follow its snapshots.
+    pnw.market_poller.follow = SHARD_IDS is not None and 0 not in SHARD_IDS
+    pnw.market_poller.start()
+    # Share the command stats with, and pick up config changes from, the other shard processes
+    if shared_stats is not None:
+        shared_stats.start(command_stats)
+    if SHARD_IDS is not None:
+        config.watch()
+    # Start writing the logs in the background
+    LOG.start()
+    ERROR_LOG.start()
+    if COMMAND_LOG:
+        COMMAND_LOG.start()
+    # Pick the command stats back up from before the last restart
+    if STATS_PATH:
+        command_stats.load(STATS_PATH)
+    # Start measuring the event loop's lag and serve the metrics endpoint
+    loop_lag.start()
+    if METRICS_PORT:
+        await metrics_exporter.start()
+
+
+# Record how long it took to get the gateway connection back after losing it
+def record_reconnect(how: str) -> None:
+    global disconnected_at
+    if disconnected_at is None:
+        return
+    seconds = time.perf_counter() - disconnected_at
+    disconnected_at = None
+    reconnect_times.observe(seconds)
+    LOG.write(f'{stamp(discord.utils.utcnow())} The bot {how} after {seconds:.2f} seconds.\n')
+
+
+# Event for when the bot is ready. Everything is set up in startup_tasks, since this can run again after reconnecting
+# (only the PnW self-check is started here, the first time, so it runs once the bot is connected).
+@bot.event
+async def on_ready() -> None:
+    global startup_seconds
+    if startup_seconds is not None:
+        record_reconnect("reconnected with a new session")
+        return
+    # Tell what guilds (servers) the bot is currently in, just because (might delete later)
+    print(f'{bot.user} is connected to the following guilds:')
+    for guild in bot.guilds:
+        print(f'{guild.name} (id: {guild.id})')
+    # Log how long it took to start up
+    startup_seconds = time.perf_counter() - STARTUP_BEGAN
+    LOG.write(f'{stamp(discord.utils.utcnow())} The bot started up in {startup_seconds:.2f} seconds.\n')
     # Let me know that all of the cogs have been loaded
-    print("Bot is ready to use!")
+    print(f"Bot is ready to use! (started in {startup_seconds:.2f} seconds)")
+    # Check the PnW API in the background (only the first time the bot is ready, like everything above)
+    if PNW_SELF_CHECK:
+        bot.self_check_task = asyncio.create_task(pnw_self_check())
+
+
+# Event for when the gateway connection is lost (discord.py reconnects by itself)
+@bot.event
+async def on_disconnect() -> None:
+    global disconnected_at
+    if disconnected_at is None:
+        disconnected_at = time.perf_counter()
+
+
+# Event for when the gateway session is resumed after a disconnect
+@bot.event
+async def on_resumed() -> None:
+    record_reconnect("resumed its session")
+
+
+# Hook for right before any command runs, used to time how long the command (and each phase of it) takes
+@bot.before_invoke
+async def start_command_timer(ctx: commands.Context) -> None:
+    ctx.timer = CommandTimer()
+    current_timer.set(ctx.timer)
+    # If one of the command's PnW API calls has to wait for the rate limiter, react to let the user know it's queued
+    pnw.on_queued.set(lambda: asyncio.create_task(ctx.message.add_reaction("\N{HOURGLASS WITH FLOWING SAND}")))
+
+
+# Record a command's use in the command stats and the structured command log (if there is one)
+def record_command(ctx: commands.Context, outcome: str) -> None:
+    timer: CommandTimer = getattr(ctx, "timer", None)
+    # commands that don't exist aren't added to the stats, so made up command names can't fill them up
+    if ctx.command is not None:
+        command_stats.record(str(ctx.command), timer, outcome != "ok")
+    if COMMAND_LOG is None:
+        return
+    COMMAND_LOG.record(ctx.message.author.id,
+                       ctx.guild.id if ctx.guild else None,
+                       str(ctx.command or ctx.invoked_with),
+                       command_args(ctx),
+                       None if timer is None else time.perf_counter() - timer.started,
+                       outcome)
+
+
+# Event for when a command finishes successfully
+@bot.event
+async def on_command_completion(ctx: commands.Context) -> None:
+    record_command(ctx, "ok")
 
 # Event for when a command error occurs
 
@@ -101,6 +317,7 @@ async def on_ready() -> None:
 async def on_command_error(ctx: commands.Context,
                            error: Exception
                            ) -> None:
+    record_command(ctx, error.__class__.__name__)
     # raise error
     # If the error is that the attempted command does not exist
     if isinstance(error, commands.CommandNotFound):
@@ -110,8 +327,7 @@ async def on_command_error(ctx: commands.Context,
         await attempt_send(ctx, embed)
         # Log that the user attempted to use this fictional command
         ERROR_LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to use non-existent command: {ctx.message.content}\n')
-        ERROR_LOG.flush()
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to use non-existent command: {ctx.message.content}\n')
         return
     # If the error is that they attempted to use a command without all of the required arguments
     elif isinstance(error, commands.MissingRequiredArgument):
@@ -122,8 +338,7 @@ async def on_command_error(ctx: commands.Context,
         await attempt_send(ctx, embed)
         # Log that the user attempted to use the command without the required arguments
         ERROR_LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) improperly used command: {ctx.command}\n')
-        ERROR_LOG.flush()
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) improperly used command: {ctx.command}\n')
         return
     elif isinstance(error, commands.BadArgument):
         # Send a message saying the user used a bad argument
@@ -133,8 +348,7 @@ async def on_command_error(ctx: commands.Context,
         await attempt_send(ctx, embed)
         # Log that the user attempted to use the command without the required arguments
         ERROR_LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) improperly used command: {ctx.command}\n')
-        ERROR_LOG.flush()
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) improperly used command: {ctx.command}\n')
         return
     elif isinstance(error, commands.DisabledCommand):
         # Send a message saying the user used attempted to use a disabled command
@@ -143,8 +357,7 @@ async def on_command_error(ctx: commands.Context,
         await attempt_send(ctx, embed)
         # Log that the user attempted to use the disabled command
         ERROR_LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to use disabled command: {ctx.command}\n')
-        ERROR_LOG.flush()
+            f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to use disabled command: {ctx.command}\n')
         return
     elif isinstance(error, commands.CommandInvokeError):
         flag = False
@@ -158,8 +371,7 @@ async def on_command_error(ctx: commands.Context,
                                   description=f"Something went wrong when you used the command {ctx.command}. The information has been sent to the owner.", color=0xFF5733)
         await attempt_send(ctx, embed)
         # Log that something went wrong
-        ERROR_LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to use the command: {ctx.command} and got errors: {", ".join(error.args)}\n')
-        ERROR_LOG.flush()
+        ERROR_LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to use the command: {ctx.command} and got errors: {", ".join(error.args)}\n')
         if flag:
             return
     elif isinstance(error, commands.MissingPermissions):
@@ -170,604 +382,13 @@ async def on_command_error(ctx: commands.Context,
     elif isinstance(error, commands.CheckFailure):
         return
     # For all other errors, get me (I'm always the first admin) and send me a summary of the error
-    me = bot.get_user(admins[0])
-    await attempt_send(me, f"There has been an error: {error.__class__.__name__}\n{', '.join(error.args)}\nRaised when attempted: {ctx.message.content}")
+    me = await bot.fetch_owner()
+    if me is not None:
+        await attempt_send(me, f"There has been an error: {error.__class__.__name__}\n{', '.join(error.args)}\nRaised when attempted: {ctx.message.content}")
     # Log the error
-    ERROR_LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) caused error {error.__class__.__name__} ({", ".join(error.args)}) with message {ctx.message.content}.\n')
-    ERROR_LOG.flush()
+    ERROR_LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) caused error {error.__class__.__name__} ({", ".join(error.args)}) with message {ctx.message.content}.\n')
     # raise error
 
 
-#############################
-#                           #
-# POLITICS AND WAR COMMANDS #
-#                           #
-#############################
-class PoliticsandWar(commands.Cog,
-                     name="Politics and War",
-                     description="All commands related to the Politics and War browser game."):
-    ########################
-    # CALCULATION COMMANDS #
-    ########################
-
-    # Add a command to calculate the cost of infrastructure
-    @commands.command(name='pnwinfra',
-                      help="Calculates the cost to go from one level of infrastructure to another, optionally for a specific nation.",
-                      brief="Calculates cost of infrastrucutre.",
-                      usage="!pnwinfra start end (nation_id)")
-    async def calc_infra(self,
-                         ctx: commands.Context,
-                         start: float = commands.parameter(
-                             description="Starting infrastructure level"),
-                         end: float = commands.parameter(
-                             description="Ending instrastructure level"),
-                         nation_id: typing.Optional[int] = commands.parameter(
-                             default=None, description="ID of the nation to calculate for")
-                         ) -> None:
-        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
-        if nation_id is None:
-            infra_cost = pnw.calculate_infrastructure_value(start, end)
-            embed = discord.Embed(title="Calculate Infrastructure Cost",
-                                  description=f'The cost to go from {start} to {end} is:\n${infra_cost: ,.2f}', color=0xFF5733)
-        # Otherwise, calculate it with their specific info
-        else:
-            # Get the infra query result
-            result = pnw.get_query("infraland", nation_id)
-            infra_cost = pnw.calc_infra_cost(start, end, result)
-            embed = discord.Embed(title="Calculate Infrastructure Cost",
-                                  description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${infra_cost: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the created embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwinfra command.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command to calculate the cost of infrastructure
-    @commands.command(name='pnwland',
-                      help="Calculates the cost to go from one level of land to another, optionally for a specific nation.",
-                      brief="Calculates cost of land.",
-                      usage="!pnwland start end (nation_id)")
-    async def calc_land(self,
-                        ctx: commands.Context,
-                        start: float = commands.parameter(
-                            description="Starting land level"),
-                        end: float = commands.parameter(
-                            description="Ending land level"),
-                        nation_id: typing.Optional[int] = commands.parameter(
-                            default=None, description="ID of the nation to calculate for")
-                        ) -> None:
-        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
-        if nation_id is None:
-            land_cost = pnw.calculate_land_value(start, end)
-            embed = discord.Embed(
-                title="Calculate Land Cost", description=f'The cost to go from {start} to {end} is:\n${land_cost: ,.2f}', color=0xFF5733)
-        # Otherwise, calculate it with their specific info
-        else:
-            # Get the infra query result
-            result = pnw.get_query("infraland", nation_id)
-            land_cost = pnw.calc_land_cost(start, end, result)
-            embed = discord.Embed(
-                title="Calculate Land Cost", description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${land_cost: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the created embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwland command.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command to calculate the cost to go from one city to another city
-    @commands.command(name='pnwcity',
-                      help="Calculates the cost to go from one city to another, optionally for a specific nation.",
-                      brief="Calculates the cost of cities.",
-                      usage="!pnwcity start end (nation_id)")
-    async def calc_city(self,
-                        ctx: commands.Context,
-                        start: int = commands.parameter(
-                            description="Starting city level"),
-                        end: int = commands.parameter(
-                            description="Ending city level"),
-                        nation_id: typing.Optional[int] = commands.parameter(
-                            default=None, description="ID of the nation to calculate for")
-                        ) -> None:
-        # If the nation_id (an optional parameter) is not set, then calculate the value without their specific info
-        if nation_id is None:
-            city_cost = pnw.calc_city_cost(start, end)
-            embed = discord.Embed(
-                title="Calculate City Cost", description=f'The cost to go from {start} to {end} is:\n${city_cost: ,.2f}', color=0xFF5733)
-        # Otherwise, calculate it with their specific info
-        else:
-            # Get the city query result
-            result = pnw.get_query("city", nation_id)
-            city_cost = pnw.calc_city_cost(start, end, result)
-            embed = discord.Embed(
-                title="Calculate City Cost", description=f'The cost to go from {start} to {end} for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}) is:\n${city_cost: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the created embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwcity command.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    ####################
-    # REVENUE COMMANDS #
-    ####################
-
-    # Add a command to calculate food revenue (usage, production, and net revenue) of a nation
-    # Users may find a very small margin of error. This is being attributed to constantly fluctuating radiation in Orbis.
-
-    @commands.command(name="pnwfood",
-                      help="Calculates the food usage, production, and net revenue for a nation.",
-                      brief="Calculates food stats for a nation.",
-                      usage="!pnwfood nation_id")
-    async def calc_food(self,
-                        ctx: commands.Context,
-                        nation_id: int = commands.parameter(
-                            description="ID of the nation to calculate for")
-                        ) -> None:
-        # Get the food query result
-        result = pnw.get_query("food", nation_id)
-        # Call the food calculation function
-        net_food, food_production, food_usage = pnw.calc_food_rev(result)
-        embed = discord.Embed(
-            title="Food Statistics", description=f'Statistics about food revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {abs(food_production): ,.2f}\nUsage: {food_usage: ,.2f}\nNet: {net_food: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the created embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwfood command with id {nation_id}.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command to calculate revenue (usage, production, and net revenue) for any raw resource of a nation
-    @commands.command(name="pnwraw",
-                      help="Calculates the raw's usage, production, and net revenue for a nation.",
-                      brief="Calculates raw stats for a nation.",
-                      usage="!pnwraw nation_id resource")
-    async def calc_raw(self,
-                       ctx: commands.Context,
-                       nation_id: int = commands.parameter(
-                           description="ID of the nation to calculate for"),
-                       resource: str = commands.parameter(
-                           default="all", description="Raw resource to calculate the revenue for")
-                       ) -> None:
-        # Do anything we need to related to resources
-        # May get rid of utility function unless I need it for manufactured command and others
-        result, flag = await resource_tasks(nation_id, ctx)
-        if flag:
-            return
-        # Call the calculation function
-        if resource.lower() == "all":
-            resources = {"coal": None, "oil": None, "iron": None,
-                         "lead": None, "bauxite": None, "uranium": None}
-            for resource in resources:
-                try:
-                    resources[resource] = pnw.calc_raw_rev(result, resource)
-                except InvalidResourceException as inst:
-                    embed = discord.Embed(
-                        title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
-                    await attempt_send(ctx, embed)
-                    return
-            embed = discord.Embed(title="All Raw Resource Statistics", description="\n".join(
-                f'{"**" + key.capitalize() + "**"}\nProduction: {value[1]: ,.2f}\nUsage: {abs(value[2]): ,.2f}\nNet: {value[0]: ,.2f}\n' for key, value in resources.items()), color=0xFF5733)
-        else:
-            try:
-                net, production, usage = pnw.calc_raw_rev(
-                    result, resource.lower())
-            except InvalidResourceException as inst:
-                embed = discord.Embed(
-                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
-                await attempt_send(ctx, embed)
-                return
-            embed = discord.Embed(title=f"{resource.capitalize()} Statistics",
-                                  description=f'Statistics about {resource.lower()} revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {abs(production): ,.2f}\nUsage: {usage: ,.2f}\nNet: {net: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the generated embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwraw command with id {nation_id} and resource {resource.lower()}.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command to calculate revenue (usage, production, and net revenue) for any manufactured resource of a nation
-    @commands.command(name="pnwmanu",
-                      help="Calculates the manufactured's usage, production, and net revenue for a nation.",
-                      brief="Calculates manufactured stats for a nation.",
-                      usage="!pnwmanu nation_id resource")
-    async def calc_manu(self,
-                        ctx: commands.Context,
-                        nation_id: int = commands.parameter(
-                            description="ID of the nation to calculate for"),
-                        resource: str = commands.parameter(
-                            default="all", description="Manufactured resource to calculate the revenue for")
-                        ) -> None:
-        # Do anything we need to related to resources
-        # May get rid of utility function unless I need it for manufactured command and others
-        result, flag = await resource_tasks(nation_id, ctx)
-        if flag:
-            return
-        # Call the calculation function
-        if resource.lower() == "all":
-            resources = {"steel": None, "aluminum": None,
-                         "gasoline": None, "munitions": None}
-            for resource in resources:
-                resources[resource] = pnw.calc_manu_rev(result, resource)
-            embed = discord.Embed(title="All Manufactured Resource Statistics", description="\n".join(
-                f'{"**" + key.capitalize() + "**"}\nProduction: {value: ,.2f}\nUsage: {0: ,.2f}\nNet: {value: ,.2f}\n' for key, value in resources.items()), color=0xFF5733)
-        else:
-            try:
-                production = pnw.calc_manu_rev(result, resource.lower())
-            except InvalidResourceException as inst:
-                embed = discord.Embed(
-                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
-                await attempt_send(ctx, embed)
-                return
-            embed = discord.Embed(title=f"{resource.capitalize()} Statistics",
-                                  description=f'Statistics about {resource.lower()} revenue for [{result.nations[0].nation_name}](https://politicsandwar.com/nation/id={nation_id}):\nProduction: {production: ,.2f}\nUsage: {0: ,.2f}\nNet: {production: ,.2f}', color=0xFF5733)
-        # Log the command usage and send the generated embed
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !pnwmanu command with id {nation_id} and resource {resource.lower()}.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    @commands.command(name="treasures",
-                      enabled=False)
-    async def treasures(self,
-                        ctx):
-        result = pnw.get_query("treasure")
-        greens = [treasure for treasure in result.treasures if (
-            treasure.color == "green" or treasure.color == "any")]
-        for treasure in greens:
-            print(treasure.color)
-
-    @commands.command(name="pnwmarket",
-                      help="Returns the lowest sell offer and highest buy offer for a given resource.",
-                      brief="Returns market information for a resource.",
-                      usage="!pnwmarket resource")
-    async def market_info(self,
-                          ctx: commands.Context,
-                          resource: str = commands.parameter(
-                              default="all", description="Resource to get the market information for")
-                          ) -> None:
-        if resource.lower() == "all":
-            resources = {"food": None, "coal": None, "oil": None, "iron": None, "lead": None, "bauxite": None,
-                         "uranium": None, "steel": None, "aluminum": None, "gasoline": None, "munitions": None}
-            for resource in resources:
-                resources[resource] = pnw.market_info(resource)
-            embed = discord.Embed(title="All Market Information", description="\n".join(
-                f'{"**" + key.capitalize() + "**"}\nLowest Sell Offer: {value[1]: ,d}\nHighest Buy Offer: {value[0]: ,d}\n' for key, value in resources.items()), color=0xFF5733)
-        else:
-            try:
-                high_buy, low_sell = pnw.market_info(resource)
-            except InvalidResourceException as inst:
-                embed = discord.Embed(
-                    title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
-                await attempt_send(ctx, embed)
-                return
-            embed = discord.Embed(title=f'{resource.capitalize()} Market Information',
-                                  description=f'Lowest Sell Offer: {low_sell: ,d}\nHighest Buy Offer: {high_buy: ,d}')
-        await attempt_send(ctx, embed)
-
-    #################
-    # USER COMMANDS #
-    #################
-
-    # WIP command to display user's Politics and War information
-
-    @commands.command(name="mypnwinfo",
-                      enabled=False)
-    async def my_info(self,
-                      ctx: commands.Context,
-                      nation_id: int = commands.parameter(
-                          description="ID of the nation whose information is to be displayed"),
-                      api_key: typing.Optional[str] = commands.parameter(
-                          default=None, description="User's API key, used to access their personal information for display")
-                      ) -> None:
-        await ctx.message.delete()
-        # If they specified an API key, then they want to display sensitive information
-        if api_key is not None:
-            result = pnw.get_query("my_info", nation_id, api_key)
-            nation = result.nations[0]
-            embed = discord.Embed(
-                title=f'Info for {nation.nation_name}', description=f'Military\nSoldiers: {nation.soldiers}\nTanks: {nation.tanks}\nAircraft: {nation.aircraft}\nShips: {nation.ships}', color=0xFF5733)
-        # Otherwise, they only want to display non-sensitive information
-        else:
-            result = pnw.get_query("my_info", nation_id)
-            nation = result.nations[0]
-            embed = discord.Embed(
-                title=f'Info for {nation.nation_name}', description=f'Military\nSoldiers: {nation.soldiers}\nTanks: {nation.tanks}\nAircraft: {nation.aircraft}\nShips: {nation.ships}', color=0xFF5733)
-        # Log the command usage
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !mypnwinfo command with id {nation_id}.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add cog check that simply calls the general_tasks utility function to check a few things
-    async def cog_check(self,
-                        ctx: commands.Context
-                        ) -> bool:
-        return await generic_tasks(LOG, ctx, allowed_guilds)
-
-
-################
-#              #
-# MOD COMMANDS #
-#              #
-################
-class Moderation(commands.Cog,
-                 description="Moderation commands"):
-    # Ban command for moderators to ban users
-    @commands.command(name="ban",
-                      help="Ban one or more user(s) with a specified reason",
-                      brief="Ban people",
-                      usage="!ban @Jacob @Wumpus Bad people")
-    @commands.has_permissions(ban_members=True)
-    async def ban(self,
-                  ctx: commands.Context,
-                  members: commands.Greedy[discord.Member] = commands.parameter(
-                      description="User(s) to ban"),
-                  *,
-                  reason: typing.Optional[str] = commands.parameter(
-                      default="No reason given", description="Reason for banning the user(s)")
-                  ) -> None:
-        if members is None:
-            await attempt_send(ctx, "You must specify which members to ban.")
-            return
-        for member in members:
-            await member.ban(reason=reason)
-        embed = discord.Embed(
-            title="Wall of Bans", description=f'The following Discord users have joined the Wall of Bans of {ctx.guild.name} for the reason "{reason}":\n{"".join(f"{member.name} ({member.id})"for member in members)}\n', color=0xFF5733)
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !ban command to ban {", ".join(f"{member.name} ({member.id})" for member in members)} for the reason "{reason}".\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    @commands.command(name="kick",
-                      help="Kick one or more user(s) with a specified reason",
-                      brief="Kick people",
-                      usage="!kick @Jacob @Wumpus Bad people")
-    @commands.has_permissions(kick_members=True)
-    async def kick(self,
-                   ctx: commands.Context,
-                   members: commands.Greedy[discord.Member] = commands.parameter(
-                       description="User(s) to kick"),
-                   *,
-                   reason: typing.Optional[str] = commands.parameter(
-                       default="No reason given", description="Reason for kicking the user(s)")
-                   ) -> None:
-        if members is None:
-            await attempt_send(ctx, "You must specify which members to kick.")
-            return
-        for member in members:
-            await member.ban(reason=reason)
-        embed = discord.Embed(
-            title="Wall of Kicks", description=f'The following Discord users have joined the Wall of Kicks of {ctx.guild.name} for the reason "{reason}":\n{"".join(f"{member.name} ({member.id})"for member in members)}\n', color=0xFF5733)
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) used the !kick command to kick {", ".join(f"{member.name} ({member.id})" for member in members)} for the reason "{reason}".\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    @commands.command(name="mute",
-                      help="Mute one or more user(s)",
-                      brief="Mute people",
-                      usage="!mute @Jacob @Wumpus")
-    @commands.has_permissions(moderate_members=True, manage_roles=True)
-    async def mute(self,
-                   ctx: commands.Context,
-                   members: commands.Greedy[discord.Member] = commands.parameter(
-                       description="User(s) to mute"),
-                   ) -> None:
-        role = discord.utils.get(ctx.guild.roles, name="Muted")
-        if not role:
-            perms = discord.Permissions.none() or discord.Permissions(
-                read_messages=True, read_message_history=True)
-            role = await ctx.guild.create_role(name="Muted", permissions=perms, colour=discord.Colour(0x0062ff))
-        for member in members:
-            if role in member.roles:
-                await attempt_send(ctx, f'Member {member.name} ({member.id}) is already muted.')
-                continue
-            await member.add_roles(role)
-            await attempt_send(ctx, f'Member {member.name} ({member.id}) has been muted.')
-
-    @commands.command(name="unmute",
-                      help="Unmute one or more user(s)",
-                      brief="Unmute people",
-                      usage="!unmute @Jacob @Wumpus")
-    @commands.has_permissions(moderate_members=True, manage_roles=True)
-    async def unmute(self,
-                     ctx: commands.Context,
-                     members: commands.Greedy[discord.Member] = commands.parameter(
-                         description="User(s) to unmute"),
-                     ) -> None:
-        role = discord.utils.get(ctx.guild.roles, name="Muted")
-        if not role:
-            await attempt_send(ctx, f'Cannot unmute a member when the Muted role does not exist yet.')
-        for member in members:
-            if role not in member.roles:
-                await attempt_send(ctx, f'Member {member.name} ({member.id}) does not have the Muted role.')
-                continue
-            await member.remove_roles(role)
-            await attempt_send(ctx, f'Member {member.name} ({member.id}) has been unmuted.')
-
-    # Add cog check that simply calls the general_tasks utility function to check a few things
-
-    async def cog_check(self,
-                        ctx: commands.Context
-                        ) -> bool:
-        return await generic_tasks(LOG, ctx, allowed_guilds)
-
-
-######################
-#                    #
-# BOT ADMIN COMMANDS #
-#                    #
-######################
-class BotAdmin(commands.Cog,
-               name="Bot Admin",
-               description="Commands for admins of the bot"):
-    # Add a command to clear the logs
-    @commands.command(name="clearlog",
-                      help="Clears all of the logs associated with the bot",
-                      brief="Clears logs",
-                      usage="!clearlogs")
-    async def clear_log(self,
-                        ctx: commands.Context
-                        ) -> None:
-        # Clear the command log by opening and passing it
-        with open(ENV('LOG_DIRECTORY'), 'w') as _:
-            pass
-        # Clear the error log in a similar way
-        with open(ENV('ERROR_LOG_DIRECTORY'), 'w') as _:
-            pass
-        # Send a message and log that the logs have been cleared
-        embed = discord.Embed(
-            title="Log Clear", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has cleared the logs.', color=0xFF5733)
-        LOG.write(
-            f'Admin {ctx.message.author} ({ctx.message.author.id}) has cleared the logs.')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command to shut the bot off
-    @commands.command(name="shutoff",
-                      help="Shuts the bot off completly",
-                      brief="Shut bot off",
-                      usage="!shutoff")
-    async def shutoff(self,
-                      ctx: commands.Context
-                      ) -> None:
-        # Create an embed saying that the bot was shut off by this specific admin
-        embed = discord.Embed(
-            title="Bot Shutoff", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has shutoff the bot.', color=0xFF5733)
-        # Write to the log that the bot was shut off and send the embed
-        LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) shut the bot off.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-        # Close the bot and exit the program
-        await bot.close()
-        sys.exit()
-
-    # Add a command to restart the bot
-    @commands.command(name="restart",
-                      help="Shuts the bot off and then brings it back online",
-                      brief="Restarts bot",
-                      usage="!restart")
-    async def restart(self,
-                      ctx: commands.Context
-                      ) -> None:
-        # Create an embed saying that the bot was restart by this specific admin
-        embed = discord.Embed(
-            title="Bot Restart", description=f'Admin {ctx.message.author} ({ctx.message.author.id}) has restarted the bot.', color=0xFF5733)
-        # Write to the log that the bot was restart
-        LOG.write(
-            f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) restarted the bot.\n')
-        LOG.flush()
-        # Send the embed
-        await attempt_send(ctx, embed)
-        # Re-execute this file to restart the bot
-        os.execv(sys.executable, ['python'] + sys.argv)
-
-    # Add a command to add a server to the permitted list of servers
-    @commands.command(name="addserver",
-                      help="Add a server to the list of servers the bot can be used in",
-                      brief="Add a permitted server",
-                      usage="!addserver (guild_id)")
-    async def add_server(self,
-                         ctx: commands.Context,
-                         guild_id: typing.Optional[int] = commands.parameter(
-                             default=None, description="The ID of the guild to add")
-                         ) -> None:
-        global admins, allowed_guilds
-        # If the user does not specify a guild_id, then they want to add the server they used the command in
-        if guild_id is None:
-            guild_id = ctx.guild.id
-        # Check if the guild is already a permitted guild
-        if check_guild(ctx.guild, allowed_guilds):
-            # Log and message telling that it is
-            embed = discord.Embed(
-                title="Already Permitted", description=f'Server {guild_id} is already an allowed server for bot commands.', color=0xFF5733)
-            LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to add server {guild_id}, but that server already has permission.\n')
-            LOG.flush()
-            await attempt_send(ctx, embed)
-            return
-        # Create a flag to indicate whether or not the ALLOWED_GUILDS variable is found in the .env
-        found = False
-        # Open the .env and read all the lines
-        with open(dotenv_path, "r") as f:
-            lines = f.readlines()
-        # Open the .env again in write mode
-        with open(dotenv_path, "w") as f:
-            # Loop through the lines read in
-            for line in lines:
-                try:
-                    # Split the key and values on =
-                    key, value = line.split('=')
-                    # Check if the key is ALLOWED_GUILDS
-                    if key == "ALLOWED_GUILDS":
-                        # If it is, then append the guild_id to the current value
-                        value = f'{value},{guild_id}'
-                        # Mark the found flag true
-                        found = True
-                    # Write the key and value to the .env again
-                    f.write(f'{key}={value}')
-                except ValueError:
-                    # In the event of an error, just write the whole file again so as to not delete parts of the .env
-                    f.write(line)
-                    pass
-            # If the key is not found, then there are no allowed guilds yet, so it needs to be added to the .env
-            if not found:
-                f.write(f'\nALLOWED_GUILDS={guild_id}')
-        # Re-assign the admins and allowed_guilds variables to account for the changes to the .env
-        admins, allowed_guilds = start(dotenv_path)
-        # Create an embed saying that the server was added successfully, log it, and send it
-        embed = discord.Embed(
-            title="Server Added", description=f"Admin {ctx.message.author} ({ctx.message.author.id}) has added the guild {guild_id} to the bot's permitted guilds.", color=0xFF5733)
-        LOG.write(
-            f"Admin {ctx.message.author} ({ctx.message.author.id}) has added the guild {guild_id} to the bot's permitted guilds.")
-        LOG.flush()
-        await attempt_send(ctx, embed)
-
-    # Add a command where I can try to keep track of how much time I spend working on the bot
-    @commands.command(name="work",
-                      help="Start or stop the clock of working on the bot.",
-                      usage="!work [start/stop]")
-    async def work(self,
-                   ctx: commands.Context,
-                   clock: str = commands.parameter(
-                       description="Whether or not to start or stop working")
-                   ) -> None:
-        global start_time
-        # Get me (the first admin)
-        me = bot.get_user(admins[0])
-        # If the clock status is start, then set the start time and message me saying I clocked in
-        if clock == "start":
-            start_time = int(time.time())
-            await attempt_send(me, f"You've 'clocked in' to working on the bot.")
-        # Otherwise, if it is stop, the set the end time
-        elif clock == "stop":
-            end_time = int(time.time())
-            # Open the .env and read all the lines
-            with open(dotenv_path, "r") as f:
-                lines = f.readlines()
-            # Open the .env again in write mode
-            with open(dotenv_path, "w") as f:
-                # Loop through the lines read in
-                for line in lines:
-                    try:
-                        # Split the key and values on =
-                        key, value = line.split('=')
-                        # Check if the key is SECONDS_WORKED
-                        if key == "SECONDS_WORKED":
-                            # If it is, then calculate the difference between the end time and the start time then add it to the current value
-                            value = f'{int(value) + (end_time - start_time)}'
-                        # Write the key and value to the .env again
-                        f.write(f'{key}={value}')
-                    except ValueError:
-                        # In the event of an error, just write the whole file again so as to not delete parts of the .env
-                        f.write(line)
-                        pass
-            # Message me letting me know I clocked out
-            await attempt_send(me, f"You've 'clocked out' to working on the bot.")
-
-    # Add a cog check that checks if the user of these commands is an admin
-    async def cog_check(self,
-                        ctx: commands.Context
-                        ) -> bool:
-        # If they're an admin, then it simply returns true
-        if ctx.message.author.id in admins:
-            return True
-        # Otherwise, it messages and logs that a non-admin tried to use the command before returning false
-        embed = discord.Embed(
-            title="Improper Access", description=f'User {ctx.message.author} ({ctx.message.author.id}) does not have permissions to run this command. Contact an Admin to resolve this issue.', color=0xFF5733)
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to use command {ctx.command}, but did not have proper access.\n')
-        LOG.flush()
-        await attempt_send(ctx, embed)
-        return False
-
-
 # Run the bot
 bot.run(TOKEN)
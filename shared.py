@@ -0,0 +1,100 @@
+# State shared by the bot and its cogs (the config, the logs, and errors found while opening them).
+# It lives in its own module so that reloading a cog never opens the logs again or loses the config.
+
+# Python imports
+from os import getenv as ENV
+# Path related imports
+from os.path import join, dirname
+# ENV related imports
+from dotenv import load_dotenv
+# Importing my utility files
+from utils.log_utils import LogWriter, CommandLog  # log writing classes
+from utils.config import ConfigStore  # admins and allowed guilds
+from utils.metrics import SharedStats  # command stats shared between shard processes
+
+errors: list[Exception] = []
+
+# Load the env from its path
+dotenv_path = join(dirname(__file__), '.env')
+load_dotenv(dotenv_path)
+# The admins and allowed guilds, read from the .env when the bot is ready
+config = ConfigStore(dotenv_path)
+# How the bot connects to Discord: "single" (one shard), "auto" (discord.py picks the number of shards and runs them
+# all in this process), or "multi" (the first process starts one process per group of shards)
+SHARD_MODE = (ENV("SHARD_MODE") or "single").lower()
+if SHARD_MODE not in ("single", "auto", "multi"):
+    inst = ValueError(SHARD_MODE)
+    inst.message = f"SHARD_MODE must be single, auto, or multi, not {SHARD_MODE}."
+    errors.append(inst)
+    SHARD_MODE = "single"
+# The total number of shards (if not given, discord.py decides in auto mode, and multi mode uses one per process)
+SHARD_COUNT = int(ENV("SHARD_COUNT")) if ENV("SHARD_COUNT") else None
+# The number of processes to run the shards in (multi mode only)
+SHARD_PROCESSES = int(ENV("SHARD_PROCESSES") or 2)
+# The shards this process runs (only set in the processes started by the multi mode launcher)
+SHARD_IDS = [int(id) for id in ENV("SHARD_IDS").split(",")] if ENV("SHARD_IDS") else None
+# What the bot receives from Discord and caches: "full" (everything) or "minimal" (only what the commands need)
+INTENTS_PROFILE = (ENV("INTENTS_PROFILE") or "full").lower()
+if INTENTS_PROFILE not in ("full", "minimal"):
+    inst = ValueError(INTENTS_PROFILE)
+    inst.message = f"INTENTS_PROFILE must be full or minimal, not {INTENTS_PROFILE}."
+    errors.append(inst)
+    INTENTS_PROFILE = "full"
+# Number of messages to cache (if not given, the profile decides, and 0 turns the message cache off)
+MESSAGE_CACHE_SIZE = (int(ENV("MESSAGE_CACHE_SIZE")) or None) if ENV("MESSAGE_CACHE_SIZE") else -1
+
+
+# A utility function to give each shard process its own copy of a file, so two processes never append to the same one
+def process_path(path: str | None) -> str | None:
+    if path is None or SHARD_IDS is None:
+        return path
+    return f"{path}.shard{SHARD_IDS[0]}"
+
+
+# Settings for the log writers: lines per batch, seconds between writes, and the size at which a log is rotated
+LOG_BATCH_SIZE = int(ENV("LOG_BATCH_SIZE") or 50)
+LOG_FLUSH_INTERVAL = float(ENV("LOG_FLUSH_INTERVAL") or 2)
+LOG_MAX_BYTES = int(ENV("LOG_MAX_BYTES") or 10_000_000)
+try:
+    LOG = LogWriter(process_path(ENV('LOG_DIRECTORY')), LOG_BATCH_SIZE,
+                    LOG_FLUSH_INTERVAL, LOG_MAX_BYTES)
+except OSError as inst:
+    inst.message = "Could not open LOG."
+    errors.append(inst)
+    pass
+except TypeError as inst:
+    inst.message = "No file provided for LOG."
+    errors.append(inst)
+    pass
+try:
+    ERROR_LOG = LogWriter(process_path(ENV('ERROR_LOG_DIRECTORY')), LOG_BATCH_SIZE,
+                          LOG_FLUSH_INTERVAL, LOG_MAX_BYTES)
+except OSError as inst:
+    inst.message = "Could not open ERROR_LOG."
+    errors.append(inst)
+    pass
+except TypeError as inst:
+    inst.message = "No file provided for ERROR_LOG."
+    errors.append(inst)
+    pass
+else:
+    # report config that couldn't be reloaded in the error log
+    config.error_log = ERROR_LOG
+# The structured command log is optional, and only kept if a file is given for it
+COMMAND_LOG: CommandLog = None
+if ENV('COMMAND_LOG_DIRECTORY'):
+    try:
+        COMMAND_LOG = CommandLog(process_path(ENV('COMMAND_LOG_DIRECTORY')), LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL)
+    except OSError as inst:
+        inst.message = "Could not open COMMAND_LOG."
+        errors.append(inst)
+        pass
+# File the command stats are saved to when the bot shuts off or restarts (optional)
+STATS_PATH = process_path(ENV('STATS_PATH'))
+# Database the shard processes share their command stats through, so !stats covers every shard (multi mode only)
+SHARD_STATS_PATH = ENV('SHARD_STATS_PATH')
+shared_stats: SharedStats = None
+if SHARD_STATS_PATH and SHARD_IDS is not None:
+    shared_stats = SharedStats(SHARD_STATS_PATH, f"shard{SHARD_IDS[0]}")
+# When the current !work session was started
+start_time = 0
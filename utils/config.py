@@ -0,0 +1,170 @@
+# Python imports
+import asyncio  # asyncio, used so only one change is written at a time
+import contextlib  # contextlib, used to hold the lock file while a change is written
+import fcntl  # fcntl, used so shard processes take turns writing changes
+import os  # os, used to replace the config file in one step
+from datetime import datetime, timezone
+# Importing my utility files
+from utils.log_utils import LogWriter, stamp  # reporting config that couldn't be reloaded
+
+
+# The bot's settings from the .env (admins and allowed guilds), kept in memory so checks never touch the file.
+# Changes are written to a temporary file that then replaces the .env, so a crash or two admin commands
+# at once can never leave a half-written .env behind.
+class ConfigStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # the lines of the file, so keys the store doesn't know about (like the token) are written back untouched
+        self.lines: list[str] = []
+        # the first admin is me, who gets sent errors
+        self.owner: int | None = None
+        self.admins: set[int] = set()
+        self.allowed_guilds: set[int] = set()
+        # only one change is written at a time, by this process (the lock) and by every shard process (the lock file)
+        self.lock = asyncio.Lock()
+        self.lock_path = f"{path}.lock"
+        # when the file was last read or written, to notice changes made by other processes
+        self.mtime: int = None
+        self.task: asyncio.Task = None
+        # where to report config that couldn't be reloaded (set once the error log is open)
+        self.error_log: LogWriter = None
+
+    # Read the file, returning any errors found while parsing it. If there are any, the last good config is kept
+    # (and is what the next change is made to), so a bad edit never locks every admin out or disallows every guild.
+    def load(self) -> list[Exception]:
+        errors: list[Exception] = []
+        try:
+            with open(self.path, "r") as f:
+                lines = f.read().splitlines()
+                # don't read the file again until it changes, even if it can't be parsed
+                self.mtime = os.fstat(f.fileno()).st_mtime_ns
+        except Exception as inst:
+            errors.append(inst)
+            return errors
+        admins: list[int] = []
+        allowed_guilds: list[int] = []
+        for key, value in self.items(lines):
+            # If the key is ADMIN_IDS, then parse it
+            if key == "ADMIN_IDS" and value != '':
+                try:
+                    admins = [int(id) for id in value.split(",")]
+                except ValueError as inst:
+                    inst.message = "An admin id was not an integer."
+                    errors.append(inst)
+            # If the key is ALLOWED_GUILDS, then parse it
+            if key == "ALLOWED_GUILDS" and value != '':
+                try:
+                    allowed_guilds = [int(id) for id in value.split(",")]
+                except ValueError as inst:
+                    inst.message = "A guild id was not an integer."
+                    errors.append(inst)
+        if errors:
+            # there is no good config yet the first time, but if the admins could be read, I can still be told about the errors
+            if self.owner is None and admins:
+                self.owner = admins[0]
+            return errors
+        self.lines = lines
+        self.owner = admins[0] if admins else None
+        self.admins = set(admins)
+        self.allowed_guilds = set(allowed_guilds)
+        return errors
+
+    # The key and value of every line that has one (of the store's lines, unless others are given)
+    def items(self, lines: list[str] = None) -> list[tuple[str, str]]:
+        items = []
+        for line in self.lines if lines is None else lines:
+            key, sep, value = line.strip().partition("=")
+            if sep:
+                items.append((key, value))
+        return items
+
+    # Get the value of a key, or default if it isn't set
+    def get(self, key: str, default: str = None) -> str | None:
+        for name, value in self.items():
+            if name == key:
+                return value
+        return default
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admins
+
+    def is_allowed(self, guild_id: int) -> bool:
+        return guild_id in self.allowed_guilds
+
+    # Add a guild to the allowed guilds, returning False if it was already allowed
+    async def add_guild(self, guild_id: int) -> bool:
+        async with self.lock, self.file_lock():
+            self.refresh(force=True)
+            if guild_id in self.allowed_guilds:
+                return False
+            current = self.get("ALLOWED_GUILDS", "")
+            await self.set_locked("ALLOWED_GUILDS", f"{current},{guild_id}" if current else str(guild_id))
+            self.allowed_guilds.add(guild_id)
+            return True
+
+    # Add to a counter stored in the file (like SECONDS_WORKED), returning its new value
+    async def add_to(self, key: str, amount: int) -> int:
+        async with self.lock, self.file_lock():
+            self.refresh(force=True)
+            total = int(self.get(key) or 0) + amount
+            await self.set_locked(key, str(total))
+            return total
+
+    # Hold the lock file, so another process can't read the file and write over this change (or the other way around)
+    @contextlib.asynccontextmanager
+    async def file_lock(self):
+        with open(self.lock_path, "a") as f:
+            await asyncio.to_thread(fcntl.flock, f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # Set a key and write the file (the locks must already be held)
+    async def set_locked(self, key: str, value: str) -> None:
+        lines = list(self.lines)
+        for index, line in enumerate(lines):
+            if line.strip().partition("=")[0] == key:
+                lines[index] = f"{key}={value}"
+                break
+        else:
+            lines.append(f"{key}={value}")
+        await asyncio.to_thread(self.write, lines)
+        # only keep the change once it is safely on disk
+        self.lines = lines
+
+    def write(self, lines: list[str]) -> None:
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+    # Re-read the file whenever it changes, so changes made by another process (like another shard) are picked up
+    def watch(self, interval: float = 5) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run_watch(interval))
+
+    async def run_watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            async with self.lock:
+                self.refresh()
+
+    # Re-read the file if another process has changed it since it was last read or written.
+    # Before every change it is always re-read (with the lock file held), so one process never writes over another's
+    # change, even if both were written within the same tick of the file system's clock.
+    def refresh(self, force: bool = False) -> None:
+        try:
+            if os.stat(self.path).st_mtime_ns == self.mtime and not force:
+                return
+        except OSError:
+            return
+        for error in self.load():
+            message = f"Reloading the config failed, so the last good config is kept: {getattr(error, 'message', error)}"
+            if self.error_log is not None:
+                self.error_log.write(f"{stamp(datetime.now(timezone.utc))} {message}\n")
+            else:
+                print(message)
@@ -0,0 +1,112 @@
+# Python imports
+import asyncio  # asyncio, used to write to the cache in the background
+import pickle  # pickle, used to store cached values
+import sqlite3  # SQLite, used to store the cache on disk
+import threading  # threading, used so only one thread uses the database at a time
+import time  # time, used to age cached values
+
+# The version of what is stored in the cache. Bump it whenever the shape of a cached value changes,
+# so that values saved by an older version of the bot are ignored instead of misread.
+SCHEMA_VERSION = 1
+
+
+# An on-disk cache of API results, so they survive the bot restarting (and can be shared by shard processes).
+# Values are queued by store and written in batches by a background task, so callers never wait on the disk.
+class DiskCache:
+    def __init__(self, path: str, flush_interval: float = 5.0) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        # values waiting to be written, keyed by (kind, key) so only the newest value of each is written
+        self.pending: dict[tuple[str, str], tuple[float, object]] = {}
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS cache (
+                               kind TEXT NOT NULL,
+                               key TEXT NOT NULL,
+                               schema_version INTEGER NOT NULL,
+                               fetched_at REAL NOT NULL,
+                               payload BLOB NOT NULL,
+                               PRIMARY KEY (kind, key))""")
+        self.db.commit()
+        # reads and writes run in worker threads, which take turns with the connection
+        self.db_lock = threading.Lock()
+        self.task: asyncio.Task = None
+        # only one batch is written at a time
+        self.lock = asyncio.Lock()
+
+    # Queue a value to be saved. fetched_at is the (wall clock) time the value was fetched from the API.
+    def store(self, kind: str, key, value, fetched_at: float) -> None:
+        self.pending[(kind, str(key))] = (fetched_at, value)
+
+    # Start writing queued values in the background
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as inst:
+                # a failed write only costs the values in that batch, so keep going
+                print(f"Writing the disk cache failed: {inst.__class__.__name__} {inst}")
+
+    # Write every queued value to the database
+    async def flush(self) -> None:
+        async with self.lock:
+            pending, self.pending = self.pending, {}
+            if pending:
+                await asyncio.to_thread(self.write_rows, pending)
+
+    def write_rows(self, pending: dict[tuple[str, str], tuple[float, object]]) -> None:
+        rows = []
+        for (kind, key), (fetched_at, value) in pending.items():
+            try:
+                rows.append((kind, key, SCHEMA_VERSION, fetched_at, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                # some values can't be saved, so they're only kept in memory
+                continue
+        with self.db_lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+
+    # Load every value of a kind fetched within the last max_age seconds, as (key, value, fetched_at)
+    async def load(self, kind: str, max_age: float) -> list[tuple[str, object, float]]:
+        return await asyncio.to_thread(self.read_rows, kind, max_age)
+
+    def read_rows(self, kind: str, max_age: float, key=None) -> list[tuple[str, object, float]]:
+        query = "SELECT key, fetched_at, payload FROM cache WHERE kind = ? AND schema_version = ? AND fetched_at >= ?"
+        parameters = (kind, SCHEMA_VERSION, time.time() - max_age)
+        if key is not None:
+            query += " AND key = ?"
+            parameters += (str(key),)
+        with self.db_lock:
+            rows = self.db.execute(query, parameters).fetchall()
+        values = []
+        for key, fetched_at, payload in rows:
+            try:
+                values.append((key, pickle.loads(payload), fetched_at))
+            except Exception:
+                # skip values that can no longer be read (the class they were saved from may have changed)
+                continue
+        return values
+
+    # Load one value if it was fetched within the last max_age seconds, as (value, fetched_at).
+    # Values still waiting to be written are returned too.
+    async def get(self, kind: str, key, max_age: float) -> tuple[object, float] | None:
+        pending = self.pending.get((kind, str(key)))
+        if pending is not None and pending[0] >= time.time() - max_age:
+            return pending[1], pending[0]
+        rows = await asyncio.to_thread(self.read_rows, kind, max_age, key)
+        if not rows:
+            return None
+        _, value, fetched_at = rows[0]
+        return value, fetched_at
+
+    # Stop the background task, write everything still queued, and close the database
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+        self.db.close()
@@ -0,0 +1,39 @@
+# Discord related imports
+import discord
+
+# The intents and caching profiles the bot can run with:
+# full caches everything Discord will send (every member, presence, and 1000 messages),
+# minimal only receives what the commands need and caches almost nothing
+INTENTS_PROFILES = ("full", "minimal")
+# Messages kept in the message cache by each profile, unless MESSAGE_CACHE_SIZE says otherwise
+DEFAULT_MAX_MESSAGES = {"full": 1000, "minimal": 100}
+
+
+# The intents for a profile
+def profile_intents(profile: str) -> discord.Intents:
+    if profile == "full":
+        return discord.Intents.all()
+    intents = discord.Intents.none()
+    # guilds, channels, and roles (the Muted role, permission checks)
+    intents.guilds = True
+    # commands are read from guild and DM messages
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    # members are needed to resolve the Member arguments of the moderation commands, but are never
+    # cached or chunked: they come from the message's mentions or are requested when a command needs them
+    intents.members = True
+    return intents
+
+
+# The keyword arguments to create the bot with for a profile
+# (max_messages can be given to change the size of the message cache, with None turning it off)
+def profile_options(profile: str, max_messages: int | None = -1) -> dict:
+    if max_messages == -1:
+        max_messages = DEFAULT_MAX_MESSAGES[profile]
+    if profile == "full":
+        return {"intents": profile_intents(profile), "max_messages": max_messages}
+    return {"intents": profile_intents(profile),
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+            "max_messages": max_messages}
@@ -0,0 +1,259 @@
+# Python imports
+import asyncio  # asyncio, used to write the logs in the background
+import os  # os, used to rotate log files
+import json  # json, used to write structured log records
+import mmap  # mmap, used to search the structured log without reading it all in
+import struct  # struct, used for the structured log's index entries
+import threading  # threading, used so only one thread uses the structured log's index at a time
+import time  # time, used to timestamp structured log records
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+# A utility function to format a timestamp for the logs. Many log lines share the same second,
+# so the formatted string for each second is cached rather than calling strftime for every line.
+@lru_cache(maxsize=128)
+def format_second(second: int) -> str:
+    return datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def stamp(moment: datetime) -> str:
+    return format_second(int(moment.timestamp()))
+
+
+# A log file that is written to in batches by a background task, so commands never wait on the disk
+class LogWriter:
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 2.0, max_bytes: int = 10_000_000, backups: int = 3) -> None:
+        # make sure the log can be opened now, so a bad path is reported at startup rather than on the first write
+        open(path, "a").close()
+        self.path = path
+        # number of lines to collect before writing, and the most seconds a line waits before being written
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # the size a log can grow to before it is rotated, and the number of rotated logs kept
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lines: list[str] = []
+        self.task: asyncio.Task = None
+        self.wake = asyncio.Event()
+        # only one batch is written at a time
+        self.lock = asyncio.Lock()
+
+    # Queue a line to be written (returns immediately)
+    def write(self, line: str) -> None:
+        self.lines.append(line)
+        if len(self.lines) >= self.batch_size:
+            self.wake.set()
+
+    # Number of lines waiting to be written
+    def queue_depth(self) -> int:
+        return len(self.lines)
+
+    # Start writing batches in the background
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            # write whenever a batch fills up or the flush interval passes, whichever comes first
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.drain()
+
+    # Write every queued line to the file
+    async def drain(self) -> None:
+        async with self.lock:
+            lines, self.lines = self.lines, []
+            if lines:
+                await asyncio.to_thread(self.write_lines, lines)
+
+    def write_lines(self, lines: list[str]) -> None:
+        self.rotate()
+        with open(self.path, "a") as f:
+            f.write("".join(lines))
+
+    # If the log has grown too big, move it to path.1 (moving path.1 to path.2, and so on) and start a new one
+    def rotate(self) -> None:
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    # Throw away queued lines and empty the log
+    async def clear(self) -> None:
+        async with self.lock:
+            self.lines = []
+            await asyncio.to_thread(lambda: open(self.path, "w").close())
+
+    # Stop the background task and write everything still queued (used when the bot shuts off or restarts)
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.drain()
+
+
+# A structured command log: one JSON record per line, plus a sidecar index of fixed-size entries so searches never
+# have to read the whole log. Each entry holds a record's timestamp, user id, guild id, and offset in the log, and the
+# positions of the previous entries for the same user and for the same guild, so one user's (or guild's) records can be
+# found newest first by following those links without touching anyone else's. The newest entry of each user and guild
+# is kept in memory, and saved to a heads file when the log is closed so that only entries written since have to be
+# read at startup.
+class CommandLog(LogWriter):
+    INDEX_ENTRY = struct.Struct("<dqqqqq")
+    # where the links to the previous entries of the same user and the same guild are in an index entry
+    USER_LINK = 4
+    GUILD_LINK = 5
+
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 2.0) -> None:
+        super().__init__(path, batch_size, flush_interval)
+        self.index_path = f"{path}.idx"
+        self.heads_path = f"{path}.heads"
+        open(self.index_path, "ab").close()
+        # the position of the newest index entry of each user and guild, and the number of entries
+        # (None until the index has been read)
+        self.user_heads: dict[int, int] = {}
+        self.guild_heads: dict[int, int] = {}
+        self.entries: int = None
+        # writes and searches run in worker threads, which take turns with the index
+        self.index_lock = threading.Lock()
+
+    # Queue a record of a command being used
+    def record(self, user_id: int, guild_id: int | None, command: str, args: list[str], latency: float | None, outcome: str) -> None:
+        entry = {
+            "ts": time.time(),
+            "user_id": user_id,
+            "guild_id": guild_id,
+            "command": command,
+            "args": args,
+            "latency_ms": None if latency is None else round(latency * 1000, 2),
+            "outcome": outcome
+        }
+        self.write(entry)
+
+    # Read the saved heads, then the index entries written after they were saved (the index lock must already be held)
+    def load_heads(self) -> None:
+        if self.entries is not None:
+            return
+        size = self.INDEX_ENTRY.size
+        self.user_heads, self.guild_heads, self.entries = {}, {}, 0
+        try:
+            with open(self.heads_path, "r") as f:
+                saved = json.load(f)
+            self.user_heads = {int(user): position for user, position in saved["users"].items()}
+            self.guild_heads = {int(guild): position for guild, position in saved["guilds"].items()}
+            self.entries = saved["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        index_bytes = os.path.getsize(self.index_path)
+        # drop an entry that was only partly written (so later entries line up again)
+        if index_bytes % size:
+            os.truncate(self.index_path, index_bytes - index_bytes % size)
+        count = index_bytes // size
+        # the index has been cleared since the heads were saved
+        if self.entries > count:
+            self.user_heads, self.guild_heads, self.entries = {}, {}, 0
+        with open(self.index_path, "rb") as f:
+            f.seek(self.entries * size)
+            data = f.read((count - self.entries) * size)
+        for position, (_, user, guild, *_) in enumerate(self.INDEX_ENTRY.iter_unpack(data), self.entries):
+            self.user_heads[user] = position
+            self.guild_heads[guild] = position
+        self.entries = count
+
+    # Append the records to the log and their entries to the index
+    # (the structured log is never rotated, since the index points into it)
+    def write_lines(self, entries: list[dict]) -> None:
+        with self.index_lock:
+            self.load_heads()
+            index = bytearray()
+            try:
+                with open(self.path, "ab") as log:
+                    offset = log.tell()
+                    for entry in entries:
+                        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+                        log.write(line)
+                        user, guild = entry["user_id"], entry["guild_id"] or 0
+                        index += self.INDEX_ENTRY.pack(entry["ts"], user, guild, offset,
+                                                       self.user_heads.get(user, -1), self.guild_heads.get(guild, -1))
+                        self.user_heads[user] = self.guild_heads[guild] = self.entries
+                        self.entries += 1
+                        offset += len(line)
+                with open(self.index_path, "ab") as f:
+                    f.write(index)
+            except BaseException:
+                # the heads may point at entries that never made it to the index, so read them again next time
+                self.entries = None
+                raise
+
+    # Save the heads, so the next start only has to read the index entries written after this
+    def save_heads(self) -> None:
+        with self.index_lock:
+            if self.entries is None:
+                return
+            temp_path = f"{self.heads_path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"entries": self.entries, "users": self.user_heads, "guilds": self.guild_heads}, f)
+            os.replace(temp_path, self.heads_path)
+
+    async def clear(self) -> None:
+        async with self.lock:
+            self.lines = []
+            await asyncio.to_thread(self.clear_files)
+
+    def clear_files(self) -> None:
+        with self.index_lock:
+            open(self.path, "w").close()
+            open(self.index_path, "w").close()
+            if os.path.exists(self.heads_path):
+                os.remove(self.heads_path)
+            self.user_heads, self.guild_heads, self.entries = {}, {}, 0
+
+    async def close(self) -> None:
+        await super().close()
+        await asyncio.to_thread(self.save_heads)
+
+    # Find the most recent records matching the filters, newest first
+    async def search(self, user_id: int = None, guild_id: int = None, since: float = 0, limit: int = 20) -> list[dict]:
+        # make sure queued records are searchable too
+        await self.drain()
+        return await asyncio.to_thread(self.search_files, user_id, guild_id, since, limit)
+
+    def search_files(self, user_id: int | None, guild_id: int | None, since: float, limit: int) -> list[dict]:
+        size = self.INDEX_ENTRY.size
+        with self.index_lock:
+            self.load_heads()
+            # follow the links of the user (or else the guild) searched for, or go back through every entry if neither is
+            if user_id is not None:
+                position, link = self.user_heads.get(user_id, -1), self.USER_LINK
+            elif guild_id is not None:
+                position, link = self.guild_heads.get(guild_id, -1), self.GUILD_LINK
+            else:
+                position, link = self.entries - 1, None
+            if position < 0:
+                return []
+            with open(self.index_path, "rb") as f_index, open(self.path, "rb") as f_log, \
+                    mmap.mmap(f_index.fileno(), 0, access=mmap.ACCESS_READ) as index, \
+                    mmap.mmap(f_log.fileno(), 0, access=mmap.ACCESS_READ) as log:
+                records = []
+                while position >= 0 and len(records) < limit:
+                    entry = self.INDEX_ENTRY.unpack_from(index, position * size)
+                    timestamp, _, entry_guild, offset = entry[:4]
+                    # timestamps only go up, so every entry before this one is older than since too
+                    if timestamp < since:
+                        break
+                    position = position - 1 if link is None else entry[link]
+                    # a search by user and guild follows the user's links, so check the guild of each of their records
+                    if guild_id is not None and entry_guild != guild_id:
+                        continue
+                    records.append(json.loads(log[offset:log.find(b"\n", offset)]))
+                return records
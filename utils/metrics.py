@@ -0,0 +1,315 @@
+# Python imports
+import asyncio  # asyncio, used to measure event loop lag
+import json  # json, used to save the stats between restarts
+import math  # math, used for the histogram's last bucket
+import sqlite3  # SQLite, used to share stats between shard processes
+import threading  # threading, used so only one thread uses the stats database at a time
+import time  # time, used to time commands
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+# Other imports
+from aiohttp import web  # aiohttp's web server, used for the metrics endpoint (installed with discord.py)
+
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+# The phases of a command that are timed separately
+PHASES = ("total", "queue", "api", "compute", "send")
+
+
+# A histogram of durations, with fixed buckets so it stays the same size no matter how many durations it holds
+class Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    # Add another histogram's durations to this one
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    # Estimate a quantile (like 0.95 for p95) by interpolating within the bucket it falls in
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0
+                # the last bucket has no upper bound, so report its lower bound
+                upper = BUCKETS[index] if BUCKETS[index] != math.inf else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-2]
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "count": self.count, "sum": self.sum}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        return histogram
+
+
+# The time spent in each phase of the command that is currently running
+class CommandTimer:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        # time spent waiting on the PnW rate limiter, kept apart from the API's own latency
+        self.queue = 0.0
+        self.api = 0.0
+        self.send = 0.0
+
+
+# The timer of the command running in the current task (None outside of commands, like in background tasks)
+current_timer: ContextVar[CommandTimer | None] = ContextVar("current_timer", default=None)
+
+
+# A utility to add the time spent in a block to a phase ("queue", "api", or "send") of the running command
+@contextmanager
+def timed(phase: str):
+    timer = current_timer.get()
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            setattr(timer, phase, getattr(timer, phase) + time.perf_counter() - began)
+
+
+# The stats collected during one window of time
+class StatsWindow:
+    def __init__(self, started_at: float) -> None:
+        self.started_at = started_at
+        # histograms keyed by (command, phase), and errors keyed by command
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self.errors: dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {"started_at": self.started_at,
+                "histograms": [[command, phase, histogram.to_dict()] for (command, phase), histogram in self.histograms.items()],
+                "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StatsWindow":
+        window = cls(data["started_at"])
+        window.histograms = {(command, phase): Histogram.from_dict(histogram) for command, phase, histogram in data["histograms"]}
+        window.errors = dict(data["errors"])
+        return window
+
+
+# Per-command latency and error stats, kept in rolling windows (by default, 12 windows of 5 minutes each)
+class CommandStats:
+    def __init__(self, window_seconds: float = 300, windows: int = 12) -> None:
+        self.window_seconds = window_seconds
+        self.windows: deque[StatsWindow] = deque(maxlen=windows)
+        # everything since the bot started, for the metrics endpoint (whose counters must only ever go up)
+        self.lifetime = StatsWindow(time.time())
+
+    # Get the window stats are currently being added to, starting a new one if the last has ended
+    def current_window(self) -> StatsWindow:
+        now = time.time()
+        if not self.windows or now - self.windows[-1].started_at >= self.window_seconds:
+            self.windows.append(StatsWindow(now))
+        return self.windows[-1]
+
+    def observe(self, command: str, phase: str, seconds: float) -> None:
+        for window in (self.current_window(), self.lifetime):
+            if (command, phase) not in window.histograms:
+                window.histograms[(command, phase)] = Histogram()
+            window.histograms[(command, phase)].observe(seconds)
+
+    # Record a finished command. Whatever time wasn't spent waiting on the rate limiter, on the API, or sending
+    # is counted as compute time.
+    def record(self, command: str, timer: CommandTimer | None, error: bool = False) -> None:
+        if error:
+            for window in (self.current_window(), self.lifetime):
+                window.errors[command] = window.errors.get(command, 0) + 1
+        if timer is None:
+            return
+        total = time.perf_counter() - timer.started
+        self.observe(command, "total", total)
+        self.observe(command, "queue", timer.queue)
+        self.observe(command, "api", timer.api)
+        self.observe(command, "send", timer.send)
+        self.observe(command, "compute", max(total - timer.queue - timer.api - timer.send, 0))
+
+    # Merge every window (plus any windows from other processes that are recent enough to be kept)
+    # into one histogram per (command, phase) and one error count per command
+    def summary(self, others: list[StatsWindow] = ()) -> tuple[dict[tuple[str, str], Histogram], dict[str, int]]:
+        histograms: dict[tuple[str, str], Histogram] = {}
+        errors: dict[str, int] = {}
+        oldest = time.time() - self.window_seconds * self.windows.maxlen
+        for window in list(self.windows) + [window for window in others if window.started_at >= oldest]:
+            for key, histogram in window.histograms.items():
+                histograms.setdefault(key, Histogram()).merge(histogram)
+            for command, count in window.errors.items():
+                errors[command] = errors.get(command, 0) + count
+        return histograms, errors
+
+    # Save the windows to a file, so the stats survive a restart
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump([window.to_dict() for window in self.windows], f)
+
+    # Load windows saved by save, dropping any that are too old to be kept
+    def load(self, path: str) -> None:
+        try:
+            with open(path, "r") as f:
+                windows = [StatsWindow.from_dict(data) for data in json.load(f)]
+        except (OSError, ValueError, KeyError):
+            return
+        oldest = time.time() - self.window_seconds * self.windows.maxlen
+        self.windows.extend(window for window in windows if window.started_at >= oldest)
+
+
+command_stats = CommandStats()
+
+
+# Command stats shared between shard processes through a SQLite database. Every process regularly
+# publishes its windows, and reads everyone else's when it needs the stats for every shard.
+class SharedStats:
+    def __init__(self, path: str, name: str, interval: float = 15) -> None:
+        # name identifies this process's row (like shard0), and interval is how often it is published
+        self.name = name
+        self.interval = interval
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, updated_at REAL NOT NULL, windows TEXT NOT NULL)")
+        self.db.commit()
+        self.db_lock = threading.Lock()
+        self.task: asyncio.Task = None
+
+    # Save this process's windows over its last ones
+    def publish(self, stats: CommandStats) -> None:
+        windows = json.dumps([window.to_dict() for window in stats.windows])
+        with self.db_lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO stats VALUES (?, ?, ?)", (self.name, time.time(), windows))
+
+    # The windows of every other process that has published recently
+    def others(self, max_age: float = 3600) -> list[StatsWindow]:
+        with self.db_lock:
+            rows = self.db.execute("SELECT windows FROM stats WHERE name != ? AND updated_at >= ?",
+                                   (self.name, time.time() - max_age)).fetchall()
+        return [StatsWindow.from_dict(data) for (windows,) in rows for data in json.loads(windows)]
+
+    # Start publishing the stats in the background
+    def start(self, stats: CommandStats) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(stats))
+
+    async def run(self, stats: CommandStats) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.publish, stats)
+            except sqlite3.Error as inst:
+                print(f"Publishing the command stats failed: {inst.__class__.__name__} {inst}")
+
+    # Stop publishing, publish one last time, and close the database
+    async def close(self, stats: CommandStats) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await asyncio.to_thread(self.publish, stats)
+        self.db.close()
+
+
+# Measures how late the event loop is to wake up from a sleep, which shows how busy (or blocked) it is
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self.lag = 0.0
+        self.histogram = Histogram()
+        self.task: asyncio.Task = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            began = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - began - self.interval, 0)
+            self.histogram.observe(self.lag)
+
+
+loop_lag = LoopLagMonitor()
+
+
+# A utility function to format a set of labels in the Prometheus text format
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+# Builds a page of metrics in the Prometheus text format
+class PrometheusPage:
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+
+    # Add a gauge or counter, with one value per set of labels
+    def value(self, name: str, kind: str, help: str, samples: list[tuple[dict[str, str], float]]) -> None:
+        self.lines.append(f"# HELP {name} {help}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{format_labels(labels)} {value}")
+
+    # Add a histogram, with one histogram per set of labels
+    def histogram(self, name: str, help: str, samples: list[tuple[dict[str, str], Histogram]]) -> None:
+        self.lines.append(f"# HELP {name} {help}")
+        self.lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in samples:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                self.lines.append(f"{name}_bucket{format_labels(labels | {'le': '+Inf' if bound == math.inf else bound})} {cumulative}")
+            self.lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            self.lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+# A local HTTP server that serves the bot's metrics at /metrics for Prometheus to scrape
+class MetricsExporter:
+    def __init__(self, collect, host: str = "127.0.0.1", port: int = 9100) -> None:
+        # collect is a function that fills in a PrometheusPage
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self.runner: web.AppRunner = None
+
+    async def start(self) -> None:
+        if self.runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        page = PrometheusPage()
+        self.collect(page)
+        return web.Response(text=page.render(), content_type="text/plain", charset="utf-8")
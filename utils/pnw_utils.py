@@ -7,8 +7,21 @@ from os import getenv as ENV
 from pnwkit import *
 import pnwkit  # PnW's Python API kit
 import math  # Python's math library
+import time  # Python's time library, used to age cached API results
+from collections import OrderedDict  # ordered dictionary, used for LRU caches
+from typing import NamedTuple  # typed tuples for results
+from array import array  # compact arrays, used to store city information column by column
+import hashlib  # hashing, used to refer to personal API keys without keeping them in stats
+import heapq  # heap queue, used to order API calls waiting on the rate limiter
+import itertools  # used to keep API calls of the same priority in order
+from contextvars import ContextVar  # context variables, used to pass the priority of API calls down
+import asyncio  # Python's asyncio library, used to await API calls
+import contextlib  # used to wait for cancelled background tasks to finish
+import aiohttp  # HTTP client shared by every API call (installed with discord.py)
 # My imports
 from utils.utils import *  # general utility functions
+from utils.metrics import timed, Histogram  # timing of command phases and API calls
+from utils.disk_cache import DiskCache  # on-disk cache of API results
 from exceptions import *  # custom exceptions
 
 dotenv_path = join(dirname(__file__), '.env')
@@ -36,28 +49,626 @@ CITY_DISCOUNTS = {
     "MP": 150000000
 }
 
-# create a QueryKit with my API key to create queries
-kit = pnwkit.QueryKit(API_KEY)
+# The endpoint raw GraphQL queries are sent to
+API_URL = "https://api.politicsandwar.com/graphql"
+# Number of seconds to wait on a single API request before giving up on it
+API_TIMEOUT = float(ENV("PNW_API_TIMEOUT") or 10)
+
+
+# API calls allowed per minute for each API key, how many can be sent at once in a burst,
+# and how many can be waiting to be sent before new ones are turned away
+RATE_LIMIT = float(ENV("PNW_RATE_LIMIT") or 60)
+RATE_BURST = int(ENV("PNW_RATE_BURST") or 10)
+RATE_QUEUE_SIZE = int(ENV("PNW_RATE_QUEUE_SIZE") or 100)
+# In multi shard mode every shard process has its own rate limiter and key pool, so each only gets an equal share
+# of every key's limits (the launcher tells each process how many processes there are)
+RATE_SHARES = int(ENV("SHARD_PROCESSES") or 1) if ENV("SHARD_IDS") else 1
+
+# Priorities of API calls (lower goes first): commands people are waiting on go before background work
+INTERACTIVE = 0
+BACKGROUND = 1
+# The priority of API calls made from the current task
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+# A function called when one of the current task's API calls has to wait, so the user can be told it's queued
+on_queued: ContextVar = ContextVar("on_queued", default=None)
+
+
+# A token bucket for one API key. Calls wait in a priority queue while the bucket is empty.
+class TokenBucket:
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST, queue_size: int = RATE_QUEUE_SIZE) -> None:
+        # tokens are added at rate per minute, up to burst
+        self.rate = rate / 60
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.queue_size = queue_size
+        # waiting calls, as (priority, order, future)
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.task: asyncio.Task = None
+
+    # Add the tokens earned since the last refill
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Wait for a token. Calls only skip the queue when nothing else is waiting.
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        self.refill()
+        if not self.waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            raise RateLimitedException()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.order), future))
+        callback = on_queued.get()
+        if callback is not None:
+            callback()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.release())
+        await future
+
+    # Hand out tokens to waiting calls, highest priority first, as they are earned
+    async def release(self) -> None:
+        while self.waiters:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self.waiters)
+            # the call may have been cancelled while it waited
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+
+# A token bucket per API key
+class RateLimiter:
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST, queue_size: int = RATE_QUEUE_SIZE) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.queue_size = queue_size
+        self.buckets: dict[str, TokenBucket] = {}
+        # calls turned away because their queue was full
+        self.rejected = 0
+
+    def bucket(self, api_key: str) -> TokenBucket:
+        if api_key not in self.buckets:
+            self.buckets[api_key] = TokenBucket(self.rate, self.burst, self.queue_size)
+        return self.buckets[api_key]
+
+    async def acquire(self, api_key: str) -> None:
+        try:
+            await self.bucket(api_key).acquire(request_priority.get())
+        except RateLimitedException:
+            self.rejected += 1
+            raise
+
+    # Number of calls waiting across every key
+    def queue_depth(self) -> int:
+        return sum(len(bucket.waiters) for bucket in self.buckets.values())
+
+    # Drop a key's bucket, unless calls are still waiting on it
+    def forget(self, api_key: str) -> None:
+        bucket = self.buckets.get(api_key)
+        if bucket is not None and not bucket.waiters:
+            del self.buckets[api_key]
+
+
+rate_limiter = RateLimiter(RATE_LIMIT / RATE_SHARES, max(1, RATE_BURST // RATE_SHARES))
+
+
+# An asyncio-native client for the PnW API so that queries never block the event loop
+class PnWClient:
+    def __init__(self, api_key: str, timeout: float = API_TIMEOUT) -> None:
+        self.api_key = api_key
+        self.timeout = timeout
+        # how long API calls take, and how many of them failed
+        self.latency = Histogram()
+        self.errors = 0
+        # the QueryKit and HTTP session are created lazily, so importing this module does no work up front
+        # (the session also has to be made inside the running event loop)
+        self.kit: pnwkit.QueryKit = None
+        self.session: aiohttp.ClientSession | None = None
+
+    # Get the QueryKit, creating it with the API key the first time it is needed
+    def get_kit(self) -> pnwkit.QueryKit:
+        if self.kit is None:
+            self.kit = pnwkit.QueryKit(self.api_key)
+            if self.session is not None:
+                self.kit.aiohttp_session = self.session
+        return self.kit
+
+    # Get the shared HTTP session, creating it if it doesn't exist yet (or was closed)
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+            # hand the same session to pnwkit so that its requests reuse our connection pool
+            self.get_kit().aiohttp_session = self.session
+        return self.session
+
+    # Build a query with the client's QueryKit
+    def query(self, *args, **kwargs):
+        return self.get_kit().query(*args, **kwargs)
+
+    # Send a query and await its result, cancelling it if it takes longer than the timeout
+    async def fetch(self, query, timeout: float = None, api_key: str = None) -> pnwkit.Result:
+        timeout = timeout or self.timeout
+        self.get_session()
+        # wait for the rate limiter of the key the query is sent with (timed apart from the API's own latency)
+        with timed("queue"):
+            await rate_limiter.acquire(api_key or self.api_key)
+        began = time.perf_counter()
+        try:
+            with timed("api"):
+                return await asyncio.wait_for(query.get_async(), timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            raise APITimeoutException(timeout)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - began)
+
+    # Send a raw GraphQL query (for things pnwkit can't build, like aliased fields) and return its data
+    async def raw(self, query: str, timeout: float = None) -> dict:
+        timeout = timeout or self.timeout
+        with timed("queue"):
+            await rate_limiter.acquire(self.api_key)
+        began = time.perf_counter()
+        try:
+            with timed("api"):
+                async with self.get_session().post(API_URL, params={"api_key": self.api_key}, json={"query": query},
+                                                   timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    body = await response.json()
+        except asyncio.TimeoutError:
+            self.errors += 1
+            raise APITimeoutException(timeout)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - began)
+        if body.get("errors"):
+            self.errors += 1
+            raise APIErrorException(body["errors"][0].get("message", "Unknown error"))
+        return body["data"]
+
+    # Close the shared HTTP session (used when the bot shuts off or restarts)
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+# create a client with my API key to send queries
+client = PnWClient(API_KEY)
+
+# Number of personal API keys kept in the pool, seconds a key can sit unused before it is dropped,
+# and requests each key can make in a day
+KEY_POOL_SIZE = int(ENV("PNW_KEY_POOL_SIZE") or 32)
+KEY_IDLE_TIMEOUT = float(ENV("PNW_KEY_IDLE_TIMEOUT") or 900)
+KEY_DAILY_QUOTA = int(ENV("PNW_KEY_DAILY_QUOTA") or 2000)
+
+
+# A utility function to refer to a personal API key (in stats, for example) without revealing it
+def key_id(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+# A QueryKit for a personal API key, and when it was last used
+class PooledKit:
+    def __init__(self, api_key: str) -> None:
+        self.kit = pnwkit.QueryKit(api_key)
+        self.used_at = time.monotonic()
+
+
+# An LRU pool of QueryKits for personal API keys. Every kit shares the bot client's HTTP session,
+# so a user's queries reuse its open connections instead of making a new one each time.
+# Keys are only ever kept in memory; usage is tracked by key_id, so it survives a key being dropped.
+class KeyPool:
+    def __init__(self, client: PnWClient, size: int = KEY_POOL_SIZE, idle_timeout: float = KEY_IDLE_TIMEOUT, quota: int = KEY_DAILY_QUOTA) -> None:
+        self.client = client
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.quota = quota
+        self.kits: OrderedDict[str, PooledKit] = OrderedDict()
+        # requests made today, keyed by key_id, as (day, requests)
+        self.usage: dict[str, tuple[int, int]] = {}
+        # the day usage from earlier days was last forgotten
+        self.pruned_day: int = None
+
+    # Get the kit for a key, creating it (and dropping the least recently used kit if the pool is full) if needed
+    def get(self, api_key: str) -> PooledKit:
+        self.evict_idle()
+        if api_key in self.kits:
+            self.kits.move_to_end(api_key)
+            pooled = self.kits[api_key]
+        else:
+            pooled = self.kits[api_key] = PooledKit(api_key)
+            while len(self.kits) > self.size:
+                self.drop(next(iter(self.kits)))
+        pooled.used_at = time.monotonic()
+        # the session may have been replaced since the kit was made
+        pooled.kit.aiohttp_session = self.client.get_session()
+        return pooled
+
+    # Drop kits that haven't been used in a while (the oldest are at the front)
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+        while self.kits:
+            api_key, pooled = next(iter(self.kits.items()))
+            if now - pooled.used_at < self.idle_timeout:
+                break
+            self.drop(api_key)
+
+    def drop(self, api_key: str) -> None:
+        del self.kits[api_key]
+        rate_limiter.forget(api_key)
+
+    # Count a request against a key's daily quota, raising QuotaExceededException if it has none left
+    def spend(self, api_key: str) -> None:
+        today = int(time.time() // 86400)
+        # forget earlier days' usage, once a day
+        if self.pruned_day != today:
+            self.usage = {key: value for key, value in self.usage.items() if value[0] == today}
+            self.pruned_day = today
+        key = key_id(api_key)
+        day, requests = self.usage.get(key, (today, 0))
+        if day != today:
+            requests = 0
+        if requests >= self.quota:
+            raise QuotaExceededException(self.quota)
+        self.usage[key] = (today, requests + 1)
+
+    # Requests each key has made today, keyed by key_id
+    def requests_today(self) -> dict[str, int]:
+        today = int(time.time() // 86400)
+        return {key: requests for key, (day, requests) in self.usage.items() if day == today}
+
+    # Build a query with a key's kit and send it
+    async def fetch(self, api_key: str, *args, timeout: float = None) -> pnwkit.Result:
+        query = self.get(api_key).kit.query(*args)
+        self.spend(api_key)
+        return await self.client.fetch(query, timeout, api_key)
+
+
+key_pool = KeyPool(client, quota=max(1, KEY_DAILY_QUOTA // RATE_SHARES))
+
+# Where to keep the cache on disk so it survives restarts (no path means the cache is only kept in memory)
+CACHE_PATH = ENV("PNW_CACHE_PATH")
+disk_cache = DiskCache(CACHE_PATH) if CACHE_PATH else None
+
+
+# Utility functions to convert between time.monotonic() times, which the caches use,
+# and wall clock times, which are saved to disk (the monotonic clock can start over on a restart)
+def to_wall_time(moment: float) -> float:
+    return time.time() - (time.monotonic() - moment)
+
+
+def from_wall_time(moment: float) -> float:
+    return time.monotonic() - (time.time() - moment)
+
+
+# Number of seconds game_info (radiation and the game date) is reused before being fetched again
+GAME_INFO_TTL = float(ENV("PNW_GAME_INFO_TTL") or 600)
+
+
+# A cache for game-wide state, which only changes once per game turn
+class GameInfoCache:
+    def __init__(self, ttl: float = GAME_INFO_TTL) -> None:
+        self.ttl = ttl
+        self.result: pnwkit.Result = None
+        self.fetched_at = 0.0
+        # only one caller refreshes the cache at a time, the rest wait for its result
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Whether the cached result exists and is younger than the TTL
+    def is_fresh(self) -> bool:
+        return self.result is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    async def get(self) -> pnwkit.Result:
+        if self.is_fresh():
+            self.hits += 1
+            return self.result
+        async with self.lock:
+            # another caller may have refreshed the cache while this one waited on the lock
+            if self.is_fresh():
+                self.hits += 1
+                return self.result
+            # another shard process may have fetched it already
+            if disk_cache is not None:
+                row = await disk_cache.get("game_info", "", self.ttl)
+                if row is not None:
+                    self.hits += 1
+                    self.result, fetched_at = row
+                    self.fetched_at = from_wall_time(fetched_at)
+                    return self.result
+            self.misses += 1
+            self.result = await get_query("radiation")
+            self.fetched_at = time.monotonic()
+            if disk_cache is not None:
+                disk_cache.store("game_info", "", self.result, time.time())
+            return self.result
+
+    # Drop the cached result so that the next call fetches it again
+    def invalidate(self) -> None:
+        self.result = None
+        self.fetched_at = 0.0
+
+
+game_info_cache = GameInfoCache()
+
+
+# function for getting the (cached) radiation and game date information from GameInfo
+async def get_game_info() -> pnwkit.Result:
+    return await game_info_cache.get()
+
+
+# function for forcing the next get_game_info call to go to the API
+def invalidate_game_info() -> None:
+    game_info_cache.invalidate()
+
+
+# function for checking that the API can be reached, returning how many seconds it took
+# (it fetches game_info, so the cache is warm for the first !pnwfood)
+async def self_check() -> float:
+    priority = request_priority.set(BACKGROUND)
+    began = time.perf_counter()
+    try:
+        invalidate_game_info()
+        await get_game_info()
+    finally:
+        request_priority.reset(priority)
+    return time.perf_counter() - began
+
+# The fields each type of nation query needs. Fields with a set of subfields are nested (like cities{...}).
+NATION_FIELDS: dict[str, dict[str, frozenset[str]]] = {
+    "food": {
+        "cities": frozenset({"farm", "land"}),
+        "defensive_wars": frozenset({"turns_left"}),
+        "offensive_wars": frozenset({"turns_left"}),
+        "soldiers": frozenset(),
+        "nation_name": frozenset(),
+        "population": frozenset(),
+        "continent": frozenset(),
+        "resource_production_center": frozenset(),
+        "massirr": frozenset(),
+        "fallout_shelter": frozenset()
+    },
+    "city": {
+        "advanced_urban_planning": frozenset(),
+        "metropolitan_planning": frozenset(),
+        "nation_name": frozenset(),
+        "urban_planning": frozenset(),
+        "domestic_policy": frozenset(),
+        "government_support_agency": frozenset()
+    },
+    "infraland": {
+        "domestic_policy": frozenset(),
+        "nation_name": frozenset(),
+        "government_support_agency": frozenset(),
+        "center_for_civil_engineering": frozenset(),
+        "advanced_engineering_corps": frozenset(),
+        "arable_land_agency": frozenset()
+    },
+    "resource": {
+        "cities": frozenset({"coal_mine", "iron_mine", "steel_mill", "powered", "coal_power", "infrastructure",
+                             "oil_well", "oil_power", "gasrefinery", "munitions_factory", "lead_mine",
+                             "aluminum_refinery", "bauxite_mine", "nuclear_power", "uranium_mine"}),
+        "nation_name": frozenset(),
+        "continent": frozenset(),
+        "resource_production_center": frozenset(),
+        "iron_works": frozenset(),
+        "arms_stockpile": frozenset(),
+        "emergency_gasoline_reserve": frozenset(),
+        "bauxite_works": frozenset(),
+        "uranium_enrichment_program": frozenset()
+    },
+    "my_info": {
+        "nation_name": frozenset(),
+        "soldiers": frozenset(),
+        "tanks": frozenset(),
+        "aircraft": frozenset(),
+        "ships": frozenset()
+    },
+    "general": {
+        "population": frozenset(),
+        "soldiers": frozenset(),
+        "continent": frozenset(),
+        "defensive_wars": frozenset({"turns_left"}),
+        "offensive_wars": frozenset({"turns_left"}),
+        "cities": frozenset({"farm", "land", "coal_mine", "steel_mill", "powered", "infrastructure", "coal_power"}),
+        "massirr": frozenset(),
+        "advanced_urban_planning": frozenset(),
+        "urban_planning": frozenset(),
+        "domestic_policy": frozenset(),
+        "government_support_agency": frozenset(),
+        "center_for_civil_engineering": frozenset(),
+        "advanced_engineering_corps": frozenset(),
+        "iron_works": frozenset(),
+        "resource_production_center": frozenset()
+    }
+}
+
+
+# function for combining the fields of several queries into one set of fields
+def merge_fields(*field_sets: dict[str, frozenset[str]]) -> dict[str, frozenset[str]]:
+    merged: dict[str, frozenset[str]] = {}
+    for fields in field_sets:
+        for name, subfields in fields.items():
+            merged[name] = merged.get(name, frozenset()) | subfields
+    return merged
+
+
+# everything needed to calculate a nation's food, raw, and manufactured revenue in one query
+NATION_FIELDS["revenue"] = merge_fields(NATION_FIELDS["food"], NATION_FIELDS["resource"])
+
+
+# function for turning a set of fields into the body of a GraphQL query
+def render_fields(fields: dict[str, frozenset[str]]) -> str:
+    return "\n".join(f'{name}{{ {" ".join(sorted(subfields))} }}' if subfields else name for name, subfields in fields.items())
+
+
+# Everything the bot knows about a single nation, merged together from however many queries it took to get it
+class NationSnapshot:
+    def __init__(self, nation_id: int) -> None:
+        self.nation_id = nation_id
+        self.values: dict = {}
+        self.fields: dict[str, frozenset[str]] = {}
+        # the snapshot ages from its first fetch, so no field in it is ever older than the cache TTL
+        self.fetched_at = time.monotonic()
+
+    # Let the snapshot be used in place of a pnwkit nation (snapshot.nation_name, snapshot.cities, etc.)
+    def __getattr__(self, name: str):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    # The fields that still need to be fetched to satisfy a query.
+    # Nested fields are re-fetched with the union of old and new subfields, since their lists are replaced whole.
+    def missing(self, fields: dict[str, frozenset[str]]) -> dict[str, frozenset[str]]:
+        missing = {}
+        for name, subfields in fields.items():
+            if name not in self.fields or not subfields <= self.fields[name]:
+                missing[name] = subfields | self.fields.get(name, frozenset())
+        return missing
+
+    # Rebuild a snapshot saved to the disk cache
+    @classmethod
+    def from_disk(cls, nation_id: int, values: dict, fields: dict[str, frozenset[str]], fetched_at: float) -> "NationSnapshot":
+        snapshot = cls(nation_id)
+        snapshot.values = values
+        snapshot.fields = fields
+        snapshot.fetched_at = from_wall_time(fetched_at)
+        return snapshot
+
+    # Copy newly fetched fields from a pnwkit nation into the snapshot
+    def merge(self, nation, fields: dict[str, frozenset[str]]) -> None:
+        for name, subfields in fields.items():
+            self.values[name] = getattr(nation, name)
+            self.fields[name] = subfields
+
+
+# A stand-in for pnwkit.Result, so callers can keep using result.nations[0]
+class CachedResult:
+    def __init__(self, nation: NationSnapshot) -> None:
+        self.nations = [nation]
+
+
+# Maximum number of nations kept in the cache, and how long (in seconds) a nation's snapshot is kept
+NATION_CACHE_SIZE = int(ENV("PNW_NATION_CACHE_SIZE") or 256)
+NATION_CACHE_TTL = float(ENV("PNW_NATION_CACHE_TTL") or 300)
+
+
+# An LRU cache of nation snapshots that only asks the API for the fields it doesn't already have
+class NationCache:
+    def __init__(self, max_size: int = NATION_CACHE_SIZE, ttl: float = NATION_CACHE_TTL) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.snapshots: OrderedDict[int, NationSnapshot] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Get a nation's snapshot if it is cached and hasn't expired
+    def get(self, nation_id: int) -> NationSnapshot | None:
+        snapshot = self.snapshots.get(nation_id)
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.fetched_at >= self.ttl:
+            del self.snapshots[nation_id]
+            return None
+        self.snapshots.move_to_end(nation_id)
+        return snapshot
+
+    # Add a snapshot to the cache, evicting the least recently used ones if it is full
+    # (and save it to the disk cache, unless it came from there)
+    def put(self, snapshot: NationSnapshot, save: bool = True) -> None:
+        self.snapshots[snapshot.nation_id] = snapshot
+        self.snapshots.move_to_end(snapshot.nation_id)
+        while len(self.snapshots) > self.max_size:
+            self.snapshots.popitem(last=False)
+        if save and disk_cache is not None:
+            disk_cache.store("nation", snapshot.nation_id, (snapshot.values, snapshot.fields), to_wall_time(snapshot.fetched_at))
+
+    # Get a snapshot holding at least the given fields, fetching only the ones that are missing
+    async def fetch(self, nation_id: int, fields: dict[str, frozenset[str]]) -> NationSnapshot:
+        snapshot = self.get(nation_id) or await self.load(nation_id) or NationSnapshot(nation_id)
+        missing = snapshot.missing(fields)
+        if not missing:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        result = await client.fetch(client.query(
+            "nations", {
+                "id": nation_id,
+                "first": 1
+            }, render_fields(missing)))
+        if len(result.nations) == 0:
+            raise NoNationFoundException(nation_id)
+        # another fetch of this nation (for other fields) may have cached a snapshot while this one waited,
+        # so merge into that one instead of replacing it, keeping any of its fields that are already as complete
+        current = self.get(nation_id)
+        if current is not None and current is not snapshot:
+            still_missing = current.missing(missing)
+            missing = {name: subfields for name, subfields in missing.items() if name in still_missing}
+            snapshot = current
+        snapshot.merge(result.nations[0], missing)
+        self.put(snapshot)
+        return snapshot
+
+    # Get a nation's snapshot from the disk cache (which another shard process may have saved), if it hasn't expired
+    async def load(self, nation_id: int) -> NationSnapshot | None:
+        if disk_cache is None:
+            return None
+        row = await disk_cache.get("nation", nation_id, self.ttl)
+        if row is None:
+            return None
+        (values, fields), fetched_at = row
+        snapshot = NationSnapshot.from_disk(nation_id, values, fields, fetched_at)
+        self.put(snapshot, save=False)
+        return snapshot
+
+    # Drop one nation (or every nation) from the cache
+    def invalidate(self, nation_id: int = None) -> None:
+        if nation_id is None:
+            self.snapshots.clear()
+        else:
+            self.snapshots.pop(nation_id, None)
+
+
+nation_cache = NationCache()
 
 ### FUNCTIONS ###
 
 
 # function for calculating the daily food revenue of a nation
 # production accurate within a few ones or tens, usage accurate within a few thousands?
-def calc_food_rev(api_result: pnwkit.Result) -> tuple[float, float, float]:
-    nation = api_result.nations[0]
-    # querying radiation information from GameInfo
-    radiation_result = get_query("radiation")
+async def calc_food_rev(api_result: pnwkit.Result) -> tuple[float, float, float]:
+    # querying radiation information from GameInfo (shared between calls until it expires)
+    radiation_result = await get_game_info()
+    return calc_nation_food_rev(api_result.nations[0], radiation_result.game_info)
+
+
+# function for calculating the daily food revenue of a single nation with already fetched GameInfo
+def calc_nation_food_rev(nation, game_info) -> tuple[float, float, float]:
     RADIATION = {
-        "af": radiation_result.game_info.radiation.africa,
-        "an": radiation_result.game_info.radiation.antarctica,
-        "as": radiation_result.game_info.radiation.asia,
-        "au": radiation_result.game_info.radiation.australia,
-        "eu": radiation_result.game_info.radiation.europe,
-        "na": radiation_result.game_info.radiation.north_america,
-        "sa": radiation_result.game_info.radiation.south_america
+        "af": game_info.radiation.africa,
+        "an": game_info.radiation.antarctica,
+        "as": game_info.radiation.asia,
+        "au": game_info.radiation.australia,
+        "eu": game_info.radiation.europe,
+        "na": game_info.radiation.north_america,
+        "sa": game_info.radiation.south_america
     }
-    month = radiation_result.game_info.game_date.month
+    month = game_info.game_date.month
 
     # intialize the food_usage variable with the usage from population
     food_usage = nation.population / 1000
@@ -110,53 +721,96 @@ def calc_food_rev(api_result: pnwkit.Result) -> tuple[float, float, float]:
         season_affect = 0.5
     # calculate the radiation factor on food production
     radiation_factor = max(
-        1 - ((continent_radiation + radiation_result.game_info.radiation.global_) / 1000), nation.fallout_shelter * 0.1)
+        1 - ((continent_radiation + game_info.radiation.global_) / 1000), nation.fallout_shelter * 0.1)
     # apply the seasonal and radiation factors to the total production
     food_production *= season_affect * radiation_factor
     # return the difference between the food_production and food_usage to determine net food revenue
     return my_round(food_production - food_usage), my_round(food_production), my_round(food_usage)
 
 
+# The discount subtracted from, and the multiplier applied to, the cost of each city for a nation
+class CityModifiers(NamedTuple):
+    discount: int = 0
+    multiplier: float = 1
+
+
+# function for resolving the city cost modifiers from a nation's projects and policies
+def city_modifiers(nation) -> CityModifiers:
+    discount = 0
+    multiplier = 1
+    # if the nation has Metropolitan Planning project, apply it
+    if (nation.metropolitan_planning):
+        discount = CITY_DISCOUNTS["MP"] + CITY_DISCOUNTS["AUP"] + CITY_DISCOUNTS["UP"]
+    # if the nation has Advanced Urban Planning project, apply it
+    elif (nation.advanced_urban_planning):
+        discount = CITY_DISCOUNTS["AUP"] + CITY_DISCOUNTS["UP"]
+    # if the nation has Urban Planning project, apply it
+    elif (nation.urban_planning):
+        discount = CITY_DISCOUNTS["UP"]
+    # if the nation's domestic policy is currently Manifest Destiny, apply it
+    if (nation.domestic_policy == pnwkit.data.DomesticPolicy(1)):
+        # if the nation has Government Support Agency project, then couple its effects with Manifest Destiny
+        if (nation.government_support_agency):
+            multiplier = 0.925
+        # otherwise, just apply Manifest Destiny
+        else:
+            multiplier = 0.95
+    return CityModifiers(discount, multiplier)
+
+
+# function for the base cost of buying a given city
+def city_base_cost(city_num: int) -> int:
+    return 50000 * ((city_num - 1) ** 3) + 150000 * city_num + 75000
+
+
+# function for the sum of the base costs of cities start_city through goal_city - 1, using the sums of cubes and integers
+def city_base_cost_sum(start_city: int, goal_city: int) -> int:
+    def cubes(m: int) -> int:
+        return (m * (m + 1) // 2) ** 2
+
+    def integers(m: int) -> int:
+        return m * (m + 1) // 2
+    return (50000 * (cubes(goal_city - 2) - cubes(start_city - 2)) +
+            150000 * (integers(goal_city - 1) - integers(start_city - 1)) +
+            75000 * (goal_city - start_city))
+
+
+# function for calculating the cost of going from one city to another with already resolved modifiers
+# each city's discounted cost is clamped at 0, so the sum only covers cities that cost more than the discount
+def city_cost(start_city: int, goal_city: int, modifiers: CityModifiers = CityModifiers()) -> float:
+    # cities below 0 always cost less than nothing, and base costs only grow from 0 onwards
+    low = max(start_city, 0)
+    high = goal_city
+    # find the first city whose base cost is more than the discount
+    while low < high:
+        middle = (low + high) // 2
+        if city_base_cost(middle) > modifiers.discount:
+            high = middle
+        else:
+            low = middle + 1
+    if low >= goal_city:
+        return 0
+    total_cost = modifiers.multiplier * (city_base_cost_sum(low, goal_city) - modifiers.discount * (goal_city - low))
+    return my_round(total_cost) if total_cost > 0 else 0
+
+
+# function for calculating the cost of many (start_city, goal_city) spans with the same modifiers
+def batch_city_cost(spans: list[tuple[int, int]], modifiers: CityModifiers = CityModifiers()) -> list[float]:
+    return [city_cost(start_city, goal_city, modifiers) for start_city, goal_city in spans]
+
+
 # function for calculating the cost of bringing a nation from their current city count to a goal
 # completely accurate
 def calc_city_cost(start_city: int, goal_city: int, nation_call: pnwkit.Result = None) -> float:
-    # intialize a temporary total cost to 0
-    total_cost = 0
-    # intialize a temporary cost to 0
-    city_cost = 0
-    for city_num in range(start_city, goal_city):
-        # calculate the cost of the next city
-        city_cost = (50000 * ((city_num - 1) ** 3) + 150000 * city_num + 75000)
-        # if the user has specified a nation
-        if nation_call is not None:
-            # if the nation has Metropolitan Planning project, apply it
-            if (nation_call.nations[0].metropolitan_planning):
-                city_cost -= (CITY_DISCOUNTS["MP"] +
-                              CITY_DISCOUNTS["AUP"] + CITY_DISCOUNTS["UP"])
-            # if the nation has Advanced Urban Planning project, apply it
-            elif (nation_call.nations[0].advanced_urban_planning):
-                city_cost -= (CITY_DISCOUNTS["AUP"] + CITY_DISCOUNTS["UP"])
-            # if the nation has Urban Planning project, apply it
-            elif (nation_call.nations[0].urban_planning):
-                city_cost -= CITY_DISCOUNTS["UP"]
-            # if the nation's domestic policy is currently Manifest Destiny, apply it
-            if (nation_call.nations[0].domestic_policy == pnwkit.data.DomesticPolicy(1)):
-                # if the nation has Government Support Agency project, then couple its effects with Manifest Destiny
-                if (nation_call.nations[0].government_support_agency):
-                    city_cost *= 0.925
-                # otherwise, just apply Manifest Destiny
-                else:
-                    city_cost *= 0.95
-        # add the cost of the next city to the total cost
-        total_cost += city_cost
-    # finally, return the total city cost
-    return my_round(total_cost) if total_cost > 0 else 0
+    # if the user has specified a nation, resolve its projects and policies once
+    modifiers = city_modifiers(nation_call.nations[0]) if nation_call is not None else CityModifiers()
+    return city_cost(start_city, goal_city, modifiers)
 
 
 # function to calculate the cost of buying infra from a current amount to a goal amount
 # accurate within a few tens or ones for multiples of 100, but within a few thousands for non-multiples of 100
 def calc_infra_cost(current_infra: float, goal_infra: float, nation_call: pnwkit.Result = None) -> float:
-    infra_cost = calculate_infrastructure_value(current_infra, goal_infra)
+    infra_cost = infra_value(current_infra, goal_infra)
     if nation_call is not None:
         nation = nation_call.nations[0]
         if (infra_cost > 0):
@@ -174,7 +828,7 @@ def calc_infra_cost(current_infra: float, goal_infra: float, nation_call: pnwkit
 
 
 def calc_land_cost(current_land: float, goal_land: float, nation_call: pnwkit.Result = None) -> float:
-    land_cost = calculate_land_value(current_land, goal_land)
+    land_cost = land_value(current_land, goal_land)
     if nation_call is not None:
         nation = nation_call.nations[0]
         if (land_cost > 0):
@@ -191,108 +845,344 @@ def calc_land_cost(current_land: float, goal_land: float, nation_call: pnwkit.Re
     return my_round(land_cost)
 
 
-def calc_raw_rev(nation_call: pnwkit.Result, resource: str) -> tuple[float, float, float]:
-    nation = nation_call.nations[0]
-    # initialize helper variables for production and usage to 0
-    production = 0
-    mill_usage = 0
-    power_usage = 0
-    nation_info = {
-        'oil': [nation.emergency_gasoline_reserve, 3, 1],
-        'coal': [nation.iron_works, 3, 0.36],
-        'iron': [nation.iron_works, 3, 0.36],
-        'bauxite': [nation.bauxite_works, 3, 0.36],
-        'lead': [nation.arms_stockpile, 6, 0.34],
-        'uranium': [nation.uranium_enrichment_program, 0, 0]
-    }
-    if (resource not in nation_info.keys()):
-        raise InvalidResourceException(resource)
-    project = nation_info[resource][0]
-    manu_used = nation_info[resource][1]
-    project_mod = nation_info[resource][2]
-    if (nation.resource_production_center and resource in CONTINENT_RSS[nation.continent] and len(nation.cities) < 16):
-        production += (math.ceil(min(len(nation.cities), 10) / 2)) * 12
-    # loop over each city in the nation
-    for city in nation.cities:
-        # calculate its oil production
-        info = {
-            'oil': [city.oil_well, city.gasrefinery, city.oil_power],
-            'coal': [city.coal_mine, city.steel_mill, city.coal_power],
-            'iron': [city.iron_mine, city.steel_mill, 0],
-            'bauxite': [city.bauxite_mine, city.aluminum_refinery, 0],
-            'lead': [city.lead_mine, city.munitions_factory, 0],
-            'uranium': [city.uranium_mine, 0, city.nuclear_power]
-        }
-        # number of the improvement (mine/well) in the city
-        raw_improvement = info[resource][0]
-        # number of the improvement (mill/refinery/factory) in the city
-        manu_improvement = info[resource][1]
-        # number of power plants in the city
-        power = info[resource][2]
-        city_production = raw_improvement * 3
-        if (resource == 'uranium'):
-            city_production *= (1 + project) * (1 +
-                                                max(my_round((raw_improvement - 1) * 0.125), 0))
-        else:
-            city_production *= (1 +
-                                max(my_round((raw_improvement - 1) * 0.05555555555), 0))
-        production += city_production
-        city_mill = manu_improvement * manu_used
-        city_mill *= (1 + max(my_round((manu_improvement - 1) *
-                      0.125), 0)) * (1 + project * project_mod)
-        mill_usage += city_mill
+# For each raw resource: the project that boosts it, the amount used per manufacturing improvement, and the project's modifier
+RAW_INFO = {
+    'oil': ("emergency_gasoline_reserve", 3, 1),
+    'coal': ("iron_works", 3, 0.36),
+    'iron': ("iron_works", 3, 0.36),
+    'bauxite': ("bauxite_works", 3, 0.36),
+    'lead': ("arms_stockpile", 6, 0.34),
+    'uranium': ("uranium_enrichment_program", 0, 0)
+}
+# For each raw resource: the city's mine/well, the mill/refinery/factory using it, and the power plant burning it
+RAW_CITY_COLUMNS = {
+    'oil': ("oil_well", "gasrefinery", "oil_power"),
+    'coal': ("coal_mine", "steel_mill", "coal_power"),
+    'iron': ("iron_mine", "steel_mill", None),
+    'bauxite': ("bauxite_mine", "aluminum_refinery", None),
+    'lead': ("lead_mine", "munitions_factory", None),
+    'uranium': ("uranium_mine", None, "nuclear_power")
+}
+# For each manufactured resource: the project that boosts it, the amount made per improvement, and the project's modifier
+MANU_INFO = {
+    'steel': ("iron_works", 9, 0.36),
+    'aluminum': ("bauxite_works", 9, 0.36),
+    'gasoline': ("emergency_gasoline_reserve", 6, 2),
+    'munitions': ("arms_stockpile", 18, 1)
+}
+# For each manufactured resource: the city improvement that makes it
+MANU_CITY_COLUMNS = {
+    'steel': "steel_mill",
+    'aluminum': "aluminum_refinery",
+    'gasoline': "gasrefinery",
+    'munitions': "munitions_factory"
+}
+
+
+# Calculates resource revenue for a nation from its cities, stored as one array per city field (built once, when first needed)
+class RevenueEngine:
+    def __init__(self, nation) -> None:
+        self.nation = nation
+        self.cities = nation.cities
+        self.columns: dict[str, array] = {}
+
+    # Get the values of a field for every city as an array
+    def column(self, name: str) -> array:
+        if name not in self.columns:
+            self.columns[name] = array('d' if name == "infrastructure" else 'l',
+                                       (getattr(city, name) for city in self.cities))
+        return self.columns[name]
+
+    # The power a single city's plants use, given how much infrastructure each plant can power
+    @staticmethod
+    def power_usage(infrastructure: float, plants: int, power_infra: int, infra_per: int) -> float:
+        # plants that are fully used power power_infra each, and the next plant powers whatever is left over
+        full = min(plants, int(infrastructure // power_infra))
+        usage = full * ((power_infra / infra_per) * 1.2)
+        leftover = infrastructure - full * power_infra
+        if plants > full and leftover > 0:
+            usage += math.ceil(leftover / infra_per) * 1.2
+        return usage
+
+    # The net revenue, production, and usage of a raw resource
+    def raw(self, resource: str) -> tuple[float, float, float]:
+        if (resource not in RAW_INFO.keys()):
+            raise InvalidResourceException(resource)
+        nation = self.nation
+        project_name, manu_used, project_mod = RAW_INFO[resource]
+        project = getattr(nation, project_name)
+        raw_name, manu_name, power_name = RAW_CITY_COLUMNS[resource]
+        production = 0
+        if (nation.resource_production_center and resource in CONTINENT_RSS[nation.continent] and len(self.cities) < 16):
+            production += (math.ceil(min(len(self.cities), 10) / 2)) * 12
+        # the production of a city only depends on how many mines/wells it has, so each count is calculated once
+        raw = self.column(raw_name)
         if (resource == 'uranium'):
-            power_infra = 2000
-            infra_per = 1000
+            per_city = [(count * 3) * ((1 + project) * (1 + max(my_round((count - 1) * 0.125), 0)))
+                        for count in range(max(raw, default=0) + 1)]
         else:
-            power_infra = 500
-            infra_per = 100
-        if (resource in POWER_RSS and city.powered and power > 0):
-            temp_infra = city.infrastructure
-            for _ in range(0, power):
-                if (temp_infra >= power_infra):
-                    power_usage += (power_infra / infra_per) * 1.2
-                    temp_infra -= power_infra
-                elif (temp_infra > 0):
-                    power_usage += math.ceil(temp_infra / infra_per) * 1.2
-                    temp_infra = 0
-    return my_round(production - mill_usage - power_usage), my_round(production), my_round(mill_usage + power_usage)
+            per_city = [(count * 3) * (1 + max(my_round((count - 1) * 0.05555555555), 0))
+                        for count in range(max(raw, default=0) + 1)]
+        production = sum(map(per_city.__getitem__, raw), production)
+        # the same goes for the usage of the mills/refineries/factories
+        mill_usage = 0
+        if manu_name is not None:
+            manu = self.column(manu_name)
+            per_city = [(count * manu_used) * ((1 + max(my_round((count - 1) * 0.125), 0)) * (1 + project * project_mod))
+                        for count in range(max(manu, default=0) + 1)]
+            mill_usage = sum(map(per_city.__getitem__, manu))
+        power_usage = 0
+        if (resource in POWER_RSS):
+            power_infra, infra_per = (2000, 1000) if resource == 'uranium' else (500, 100)
+            power_usage = sum(self.power_usage(infrastructure, plants, power_infra, infra_per)
+                              for infrastructure, plants, powered in zip(self.column("infrastructure"), self.column(power_name), self.column("powered"))
+                              if powered and plants > 0)
+        return my_round(production - mill_usage - power_usage), my_round(production), my_round(mill_usage + power_usage)
+
+    # The production of a manufactured resource
+    def manu(self, resource: str) -> float:
+        if (resource not in MANU_INFO.keys()):
+            raise InvalidResourceException(resource)
+        project_name, generated, project_mod = MANU_INFO[resource]
+        project = getattr(self.nation, project_name)
+        improvement = self.column(MANU_CITY_COLUMNS[resource])
+        per_city = [count * generated * (1 + max(my_round((count - 1) * 0.125), 0)) * (1 + project * project_mod)
+                    for count in range(max(improvement, default=0) + 1)]
+        # only powered cities produce anything
+        production = sum(per_city[count] for count, powered in zip(improvement, self.column("powered")) if powered)
+        return my_round(production)
+
+
+# function for calculating the net revenue, production, and usage of every raw and manufactured resource,
+# reading each city field only once
+def calc_all_rev(nation_call: pnwkit.Result) -> dict[str, tuple[float, float, float]]:
+    engine = RevenueEngine(nation_call.nations[0])
+    revenue = {resource: engine.raw(resource) for resource in RAW_INFO}
+    for resource in MANU_INFO:
+        # nothing uses manufactured resources (yet), so their net revenue is their production
+        production = engine.manu(resource)
+        revenue[resource] = (production, production, 0)
+    return revenue
+
+
+# Number of alliance members requested per page (the most the API allows)
+ALLIANCE_PAGE_SIZE = 500
+# everything needed for an alliance member's line in an alliance report
+NATION_FIELDS["alliance"] = merge_fields(NATION_FIELDS["revenue"], NATION_FIELDS["city"], NATION_FIELDS["infraland"],
+                                         {"id": frozenset(), "cities": frozenset({"infrastructure"})})
+
+
+# function for fetching every member of an alliance, a page at a time, and adding them to the nation cache
+async def get_alliance_members(alliance_id: int, fields: dict[str, frozenset[str]] = NATION_FIELDS["alliance"]) -> list[NationSnapshot]:
+    members = []
+    page = 1
+    while True:
+        result = await client.fetch(client.query(
+            "nations", {
+                "alliance_id": [alliance_id],
+                "first": ALLIANCE_PAGE_SIZE,
+                "page": page
+            }, render_fields(fields)))
+        for nation in result.nations:
+            snapshot = nation_cache.get(int(nation.id)) or NationSnapshot(int(nation.id))
+            snapshot.merge(nation, fields)
+            nation_cache.put(snapshot)
+            members.append(snapshot)
+        # a page that isn't full is the last one
+        if len(result.nations) < ALLIANCE_PAGE_SIZE:
+            break
+        page += 1
+    if not members:
+        raise NoAllianceFoundException(alliance_id)
+    return members
+
+
+# The figures for one member of an alliance
+class MemberReport(NamedTuple):
+    nation_id: int
+    nation_name: str
+    cities: int
+    infrastructure: float
+    food: float
+    raw: dict[str, float]
+    manu: dict[str, float]
+    next_city_cost: float
+
+
+# function for calculating food, raw, manufactured, and city/infra figures for every member of an alliance
+async def alliance_report(alliance_id: int) -> list[MemberReport]:
+    # reports are big, so their API calls wait behind those of other commands
+    priority = request_priority.set(BACKGROUND)
+    try:
+        members, game_info = await asyncio.gather(get_alliance_members(alliance_id), get_game_info())
+    finally:
+        request_priority.reset(priority)
+    reports = []
+    for nation in members:
+        engine = RevenueEngine(nation)
+        cities = len(nation.cities)
+        reports.append(MemberReport(nation.nation_id,
+                                    nation.nation_name,
+                                    cities,
+                                    my_round(sum(engine.column("infrastructure"))),
+                                    calc_nation_food_rev(nation, game_info.game_info)[0],
+                                    {resource: engine.raw(resource)[0] for resource in RAW_INFO},
+                                    {resource: engine.manu(resource) for resource in MANU_INFO},
+                                    city_cost(cities, cities + 1, city_modifiers(nation))))
+    return reports
+
+
+def calc_raw_rev(nation_call: pnwkit.Result, resource: str) -> tuple[float, float, float]:
+    return RevenueEngine(nation_call.nations[0]).raw(resource)
 
 
 def calc_manu_rev(nation_call: pnwkit.Result, resource: str) -> float:
-    nation = nation_call.nations[0]
-    production = 0
-    nation_info = {
-        'steel': [nation.iron_works, 9, 0.36],
-        'aluminum': [nation.bauxite_works, 9, 0.36],
-        'gasoline': [nation.emergency_gasoline_reserve, 6, 2, 0.34],
-        'munitions': [nation.arms_stockpile, 18, 1]
-    }
-    if (resource not in nation_info.keys()):
-        raise InvalidResourceException(resource)
-    project = nation_info[resource][0]
-    generated = nation_info[resource][1]
-    project_mod = nation_info[resource][2]
-    for city in nation.cities:
-        city_info = {
-            'steel': city.steel_mill,
-            'aluminum': city.aluminum_refinery,
-            'gasoline': city.gasrefinery,
-            'munitions': city.munitions_factory
-        }
-        if city.powered:
-            improvement = city_info[resource]
-            production += improvement * generated * \
-                (1 + max(my_round((improvement - 1) * 0.125), 0)) * \
-                (1 + project * project_mod)
-    return my_round(production)
-
-
-def market_info(resource: str) -> tuple[int, int]:
+    return RevenueEngine(nation_call.nations[0]).manu(resource)
+
+
+async def market_info(resource: str) -> tuple[int, int]:
     if resource not in RSS:
         raise InvalidResourceException(resource)
-    return get_query(query_type="market", resource=resource, buy_or_sell="buy").trades[0].price, get_query(query_type="market", resource=resource, buy_or_sell="sell").trades[0].price
+    prices = (await market_overview([resource]))[resource]
+    return prices.high_buy, prices.low_sell
+
+
+# The best offers on the market for a resource (None when there are no offers of that kind)
+class MarketPrices(NamedTuple):
+    resource: str
+    high_buy: int | None
+    low_sell: int | None
+
+
+# function for building the aliased GraphQL query that gets the top buy and sell offers of every given resource
+def market_overview_query(resources: list[str], depth: int = 1) -> str:
+    trades = []
+    for resource in resources:
+        for buy_or_sell, order in [("buy", "DESC"), ("sell", "ASC")]:
+            trades.append(f'{resource}_{buy_or_sell}: trades(offer_resource: "{resource}", buy_or_sell: "{buy_or_sell}", '
+                          f'accepted: false, type: GLOBAL, orderBy: [{{column: PRICE, order: {order}}}], first: {depth}) {{ data {{ price }} }}')
+    return "{\n" + "\n".join(trades) + "\n}"
+
+
+# function for getting the market prices of many resources in a single API call
+async def market_overview(resources: list[str] = RSS) -> dict[str, MarketPrices]:
+    for resource in resources:
+        if resource not in RSS:
+            raise InvalidResourceException(resource)
+    data = await query_flight.run(("market_overview", tuple(resources)), client.raw, market_overview_query(resources))
+    prices = {}
+    for resource in resources:
+        buys = data[f"{resource}_buy"]["data"]
+        sells = data[f"{resource}_sell"]["data"]
+        prices[resource] = MarketPrices(resource,
+                                        buys[0]["price"] if buys else None,
+                                        sells[0]["price"] if sells else None)
+    return prices
+
+
+
+# Number of seconds between market polls (0 turns the poller off) and the number of offers kept per side
+MARKET_POLL_INTERVAL = float(ENV("PNW_MARKET_POLL_INTERVAL") or 0)
+MARKET_DEPTH = int(ENV("PNW_MARKET_DEPTH") or 5)
+
+
+# The top offers for every resource at the time of a poll, best offer first
+class MarketSnapshot(NamedTuple):
+    buy: dict[str, list[int]]
+    sell: dict[str, list[int]]
+    fetched_at: float
+
+
+# A background task that keeps an in-memory snapshot of the market's order book up to date
+class MarketPoller:
+    def __init__(self, interval: float = MARKET_POLL_INTERVAL, depth: int = MARKET_DEPTH) -> None:
+        self.interval = interval
+        self.depth = depth
+        # when several shard processes run, only one polls the API and the rest follow its snapshots in the disk cache
+        self.follow = False
+        self.snapshot: MarketSnapshot = None
+        self.task: asyncio.Task = None
+
+    # Start polling, unless the poller is turned off or already running
+    def start(self) -> None:
+        if self.interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    # Stop polling, waiting for a poll that is under way to finish cancelling (so it never uses the client or
+    # the disk cache after they are closed)
+    async def stop(self) -> None:
+        if self.task is not None:
+            task, self.task = self.task, None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def run(self) -> None:
+        # polling is background work, so commands' API calls go first
+        request_priority.set(BACKGROUND)
+        # a snapshot loaded from disk is kept until it is due to be replaced
+        if self.snapshot is not None:
+            await asyncio.sleep(max(self.interval - self.age(), 0))
+        while True:
+            try:
+                await self.refresh()
+            except Exception as inst:
+                # keep serving the last snapshot if a poll fails, and try again next interval
+                print(f"Market poll failed: {inst.__class__.__name__} {inst}")
+            await asyncio.sleep(self.interval)
+
+    # Fetch the order book for every resource in one API call and replace the snapshot
+    # (or, when following, pick up the newest snapshot in the disk cache)
+    async def refresh(self) -> None:
+        if self.follow and disk_cache is not None:
+            row = await disk_cache.get("market", "", self.interval * 2)
+            if row is not None:
+                self.snapshot = row[0]
+            return
+        data = await client.raw(market_overview_query(RSS, self.depth))
+        self.snapshot = MarketSnapshot({resource: [trade["price"] for trade in data[f"{resource}_buy"]["data"]] for resource in RSS},
+                                       {resource: [trade["price"] for trade in data[f"{resource}_sell"]["data"]] for resource in RSS},
+                                       time.time())
+        if disk_cache is not None:
+            disk_cache.store("market", "", self.snapshot, self.snapshot.fetched_at)
+
+    # Number of seconds since the snapshot was taken
+    def age(self) -> float:
+        return time.time() - self.snapshot.fetched_at
+
+    # Whether there is a snapshot recent enough to answer from (it is allowed to miss one poll)
+    def is_fresh(self) -> bool:
+        return self.snapshot is not None and self.age() < self.interval * 2
+
+    # The best prices in the snapshot, in the same form as market_overview
+    def prices(self, resources: list[str] = RSS) -> dict[str, MarketPrices]:
+        prices = {}
+        for resource in resources:
+            if resource not in RSS:
+                raise InvalidResourceException(resource)
+            buys = self.snapshot.buy[resource]
+            sells = self.snapshot.sell[resource]
+            prices[resource] = MarketPrices(resource, buys[0] if buys else None, sells[0] if sells else None)
+        return prices
+
+
+market_poller = MarketPoller()
+
 
+# function for filling the caches with what was saved to disk before the last restart,
+# so the first commands after a restart don't all go to the API at once
+async def warm_caches() -> None:
+    if disk_cache is None:
+        return
+    for _, result, fetched_at in await disk_cache.load("game_info", game_info_cache.ttl):
+        game_info_cache.result = result
+        game_info_cache.fetched_at = from_wall_time(fetched_at)
+    # put the oldest nations in first, so the LRU order is kept
+    for key, (values, fields), fetched_at in sorted(await disk_cache.load("nation", nation_cache.ttl), key=lambda row: row[2]):
+        nation_cache.put(NationSnapshot.from_disk(int(key), values, fields, fetched_at), save=False)
+    if market_poller.interval > 0:
+        for _, snapshot, _ in await disk_cache.load("market", market_poller.interval * 2):
+            market_poller.snapshot = snapshot
 
 ### The following code is modified code from the open source Rift project ###
 ### (https://github.com/mrvillage/rift/blob/master/bot/src/funcs/tools.py) ###
@@ -329,77 +1219,155 @@ def calculate_land_value(start: float, end: float) -> float:
 ### End of code from Rift ###
 
 
-def get_query(query_type: str = "general", nation_id: int = None, api_key: str = API_KEY, resource: str = None, buy_or_sell: str = None) -> pnwkit.Result:
-    if query_type == "food":
-        query = kit.query(
-            "nations", {
-                "id": nation_id,
-                "first": 1,
-            },
-            """
-            cities{
-                farm
-                land
-            }
-            defensive_wars{
-                turns_left
-            }
-            offensive_wars{
-                turns_left
-            }
-            soldiers
-            nation_name
-            population
-            continent
-            resource_production_center
-            massirr
-            fallout_shelter
-            """)
-    elif query_type == "market":
-        query = kit.query(
-            "trades", {
-                "offer_resource": resource,
-                "buy_or_sell": buy_or_sell,
-                "accepted": False,
-                "type": pnwkit.TradeType.GLOBAL,
-                "orderBy": pnwkit.OrderBy("return_amount", pnwkit.Order.ASC if buy_or_sell == "sell" else pnwkit.Order.DESC)
-            },
-            """
-            price
-            """
-        )
-    elif query_type == "city":
-        query = kit.query(
-            "nations", {
-                "id": nation_id,
-                "first": 1
-            },
-            """
-            cities{
-            }
-            advanced_urban_planning
-            metropolitan_planning
-            nation_name
-            urban_planning
-            domestic_policy
-            government_support_agency
-            """)
-    elif query_type == "infraland":
-        query = kit.query(
-            "nations", {
-                "id": nation_id,
-                "first": 1
-            },
-            """
-                domestic_policy
-                nation_name
-                government_support_agency
-                center_for_civil_engineering
-                advanced_engineering_corps
-                arable_land_agency
-                """)
-    elif query_type == "radiation":
-        query = kit.query(
+# function for converting a value to an integer number of hundredths, rounding the same way my_round does
+def to_hundredths(num: float) -> int:
+    temp = num * 100
+    if temp - math.floor(temp) < 0.5:
+        return math.floor(temp)
+    return math.ceil(temp)
+
+
+# Prices spans of infrastructure or land in O(1) using prefix sums of chunk prices.
+# Gives the same answer as the recursive functions above, but adds the chunks up as exact integers.
+class ChunkPriceTable:
+    def __init__(self, price_function, chunk: int, sell_price: float, max_level: int, max_tables: int = 256) -> None:
+        self.price_function = price_function
+        # the size of a chunk, in hundredths of a level
+        self.chunk = chunk * 100
+        # the price per level when going down (selling)
+        self.sell_price = sell_price
+        # the highest level that can be priced, which keeps each table at most max_level / chunk entries long
+        self.max_level = max_level
+        # prefix sums of chunk prices (in cents), one table per position modulo the chunk size,
+        # keeping only the max_tables most recently used
+        self.tables: OrderedDict[int, list[int]] = OrderedDict()
+        self.max_tables = max_tables
+
+    # The price (in cents) of one level of a chunk that starts at the given position (in hundredths)
+    def chunk_price(self, position: int) -> int:
+        return to_hundredths(self.price_function(position / 100))
+
+    # The sum of chunk prices at positions offset, offset + chunk, ... up to (but not including) index end
+    def chunk_sum(self, offset: int, start: int, end: int) -> int:
+        total = 0
+        # positions below zero aren't in the tables, so they are added up directly
+        while start < min(end, 0):
+            total += self.chunk_price(offset + start * self.chunk)
+            start += 1
+        if start >= end:
+            return total
+        table = self.tables.get(offset)
+        if table is None:
+            table = self.tables[offset] = [0]
+            if len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(offset)
+        while len(table) <= end:
+            table.append(table[-1] + self.chunk_price(offset + (len(table) - 1) * self.chunk))
+        return total + table[end] - table[start]
+
+    # The cost to go from start to end
+    def cost(self, start: float, end: float) -> float:
+        for level in (start, end):
+            if not abs(level) <= self.max_level:
+                raise LevelTooHighException(level, self.max_level)
+        start = to_hundredths(start)
+        end = to_hundredths(end)
+        difference = end - start
+        if difference < 0:
+            return self.sell_price * (difference / 100)
+        # spans of at most a single chunk are all bought at the starting price
+        if difference <= self.chunk:
+            return self.chunk_price(start) * difference / 10000
+        # otherwise the leftover part of a chunk is bought first, then the whole chunks leading up to end
+        leftover = difference % self.chunk
+        offset = end % self.chunk
+        total = self.chunk_price(start) * leftover
+        total += self.chunk * self.chunk_sum(offset, (start + leftover - offset) // self.chunk, (end - offset) // self.chunk)
+        return total / 10000
+
+    # The costs of many (start, end) spans at once, sharing the same prefix tables
+    def bulk_cost(self, spans: list[tuple[float, float]]) -> list[float]:
+        return [self.cost(start, end) for start, end in spans]
+
+
+# The highest infrastructure and land levels that can be priced (far above what any city reaches)
+MAX_INFRA_LEVEL = 100000
+MAX_LAND_LEVEL = 100000
+infra_prices = ChunkPriceTable(infrastructure_price, 100, 150, MAX_INFRA_LEVEL)
+land_prices = ChunkPriceTable(land_price, 500, 50, MAX_LAND_LEVEL)
+
+
+# function for getting the base cost to go from one infrastructure level to another
+def infra_value(start: float, end: float) -> float:
+    return infra_prices.cost(start, end)
+
+
+# function for getting the base cost to go from one land level to another
+def land_value(start: float, end: float) -> float:
+    return land_prices.cost(start, end)
+
+
+# function for getting the base costs of many infrastructure spans at once
+def bulk_infra_value(spans: list[tuple[float, float]]) -> list[float]:
+    return infra_prices.bulk_cost(spans)
+
+
+# function for getting the base costs of many land spans at once
+def bulk_land_value(spans: list[tuple[float, float]]) -> list[float]:
+    return land_prices.bulk_cost(spans)
+
+
+# Lets identical calls that are made at the same time share a single call instead of each making their own
+class SingleFlight:
+    def __init__(self) -> None:
+        self.in_flight: dict[tuple, asyncio.Task] = {}
+        # total number of calls, and the number of those that were answered by a call already in flight
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: tuple, function, *args, **kwargs):
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # the call itself is timed for whoever started it, so time this caller's wait on it separately
+            with timed("api"):
+                return await asyncio.shield(task)
+        task = asyncio.ensure_future(function(*args, **kwargs))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda done: self.finish(key, done))
+        # shield the shared call so one caller being cancelled doesn't cancel it for everyone else
+        return await asyncio.shield(task)
+
+    # Stop sharing a call once it has finished
+    def finish(self, key: tuple, task: asyncio.Task) -> None:
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # mark the exception as retrieved in case every caller was cancelled before seeing it
+        if not task.cancelled():
+            task.exception()
+
+
+query_flight = SingleFlight()
+
+
+# function for querying the PnW API for a nation's info, the radiation, or the treasures (market prices come from market_overview)
+async def get_query(query_type: str = "general", nation_id: int = None, api_key: str = API_KEY) -> pnwkit.Result:
+    # a query made with a user's personal API key is never shared with anyone else
+    if api_key != API_KEY:
+        return await send_query(query_type, nation_id, api_key)
+    return await query_flight.run((query_type, nation_id), send_query, query_type, nation_id, api_key)
+
+
+async def send_query(query_type: str = "general", nation_id: int = None, api_key: str = API_KEY) -> pnwkit.Result:
+    # nation queries made with my API key are served from (and merged into) the nation cache
+    if query_type not in ["radiation", "treasure"] and api_key == API_KEY:
+        fields = NATION_FIELDS.get(query_type, NATION_FIELDS["general"])
+        return CachedResult(await nation_cache.fetch(nation_id, fields))
+    if query_type == "radiation":
+        query = client.query(
             "game_info", {}, """
             game_date
             radiation {
@@ -413,41 +1381,8 @@ def get_query(query_type: str = "general", nation_id: int = None, api_key: str =
                 south_america
             }
             """)
-    elif query_type == "resource":
-        query = kit.query(
-            "nations", {
-                "id": nation_id,
-                "first": 1,
-            },
-            """
-            cities{
-                coal_mine
-                iron_mine
-                steel_mill
-                powered
-                coal_power
-                infrastructure
-                oil_well
-                oil_power
-                gasrefinery
-                munitions_factory
-                lead_mine
-                aluminum_refinery
-                bauxite_mine
-                nuclear_power
-                uranium_mine
-            }
-            nation_name
-            continent
-            resource_production_center
-            iron_works
-            arms_stockpile
-            emergency_gasoline_reserve
-            bauxite_works
-            uranium_enrichment_program
-            """)
     elif query_type == "treasure":
-        query = kit.query("treasures", {}, """
+        query = client.query("treasures", {}, """
                 name,
                 color,
                 continent,
@@ -456,75 +1391,20 @@ def get_query(query_type: str = "general", nation_id: int = None, api_key: str =
                 nation_id,
                 nation
                 """)
-    elif query_type == "my_info":
-        if api_key == API_KEY:
-            query = kit.query(
-                "nations", {
-                    "id": nation_id,
-                    "first": 1
-                }, """
-                    soldiers
-                    tanks
-                    aircraft
-                    ships
-                    """)
+    try:
+        if query_type in ["radiation", "treasure"]:
+            result = await client.fetch(query)
         else:
-            temp_kit = pnwkit.QueryKit(api_key)
-            query = temp_kit.query(
-                "nations", {
+            # a user's personal API key is never cached, since the information it returns is private
+            result = await key_pool.fetch(
+                api_key, "nations", {
                     "id": nation_id,
                     "first": 1
-                }, """
-                    soldiers
-                    tanks
-                    aircraft
-                    ships
-                    """)
-    else:
-        query = kit.query(
-            "nations", {
-                "id": nation_id,
-                "first": 1
-            }, """
-                population
-                soldiers
-                continent
-                defensive_wars{
-                    turns_left
-                }
-                offensive_wars{
-                    turns_left
-                }
-                cities{
-                    farm
-                    land
-                    coal_mine
-                    steel_mill
-                    powered
-                    infrastructure
-                    coal_power
-                }
-                massirr
-                advanced_urban_planning
-                urban_planning
-                domestic_policy
-                government_support_agency
-                center_for_civil_engineering
-                advanced_engineering_corps
-                iron_works
-                resource_production_center
-                """)
-    try:
-        result = query.get()
-        if query_type not in ["radiation", "treasure", "market"] and len(result.nations) == 0:
-            raise NoNationFoundException(
-                "No nation exists with that nation id.")
+                }, render_fields(NATION_FIELDS["my_info"]))
+        if query_type not in ["radiation", "treasure"] and len(result.nations) == 0:
+            raise NoNationFoundException(nation_id)
         return result
     except NoNationFoundException as inst:
         raise inst
     # except Exception as inst:
     #    raise GeneralException(inst)
-
-
-# "Test" API call to get a bunch of information
-general_query = get_query(nation_id=244934)
@@ -0,0 +1,62 @@
+# Python imports
+import os  # os, used to read and pass on the shard settings
+import signal  # signal, used to pass shutdowns on to the shard processes
+import subprocess  # subprocess, used to start the shard processes
+import sys  # sys, used to start the shard processes with the same Python
+
+
+# A utility function to split shards 0 to shard_count - 1 into (at most) processes groups of consecutive shards
+def shard_groups(shard_count: int, processes: int) -> list[list[int]]:
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    groups = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+# Run a script once per group of shards, each in its own process, and wait for every process to exit.
+# Each process is told its shards through SHARD_IDS and SHARD_COUNT, and how many processes were started through
+# SHARD_PROCESSES (so they can split the PnW API's limits), and gets its own metrics port (counting up from
+# metrics_port) if one is given. Returns the first non-zero exit code, or 0.
+def launch(script: str, shard_count: int, processes: int, environment: dict[str, str], metrics_port: int = 0) -> int:
+    children: list[subprocess.Popen] = []
+    groups = shard_groups(shard_count, processes)
+    for index, group in enumerate(groups):
+        env = os.environ | environment | {"SHARD_IDS": ",".join(str(id) for id in group), "SHARD_COUNT": str(shard_count),
+                                          "SHARD_PROCESSES": str(len(groups))}
+        if metrics_port:
+            env["METRICS_PORT"] = str(metrics_port + index)
+        children.append(subprocess.Popen([sys.executable, script], env=env))
+        print(f"Started shards {group[0]}-{group[-1]} of {shard_count} in process {children[-1].pid}")
+
+    # Pass a SIGTERM on to the shard processes, so they can write everything out before exiting. A Ctrl-C already
+    # reaches them (they are in the same process group), so on SIGINT this only keeps waiting for them to finish closing.
+    def stop(signum, frame) -> None:
+        if signum != signal.SIGTERM:
+            return
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signal.SIGTERM)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    codes = [child.wait() for child in children]
+    return next((code for code in codes if code != 0), 0)
+
+
+# If this is the first process in multi mode, start the shard processes and exit once they have all exited.
+# It is called before anything else is set up (the env must already be loaded), so the launcher never builds a bot,
+# opens the logs, or sets up the PnW client of its own. The shard processes share the PnW cache and command stats
+# through SQLite files next to the script, unless other paths are given.
+def launch_if_multi(script: str) -> None:
+    if (os.getenv("SHARD_MODE") or "single").lower() != "multi" or os.getenv("SHARD_IDS"):
+        return
+    processes = int(os.getenv("SHARD_PROCESSES") or 2)
+    directory = os.path.dirname(os.path.abspath(script))
+    sys.exit(launch(script, int(os.getenv("SHARD_COUNT") or 0) or processes, processes, {
+        "PNW_CACHE_PATH": os.getenv("PNW_CACHE_PATH") or os.path.join(directory, "pnw_cache.sqlite3"),
+        "SHARD_STATS_PATH": os.getenv("SHARD_STATS_PATH") or os.path.join(directory, "shard_stats.sqlite3")
+    }, int(os.getenv("METRICS_PORT") or 0)))
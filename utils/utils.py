@@ -1,25 +1,22 @@
-from io import TextIOWrapper
 import discord
 import pnwkit
 import utils.pnw_utils as pnw
 import math
 from discord.ext import commands
+from utils.log_utils import LogWriter, stamp
+from utils.metrics import timed
 
 # A utility function to check whether or not a guild is a currently permitted guild
 
 
-def check_guild(guild: discord.Guild, allowed_guilds: list[int]) -> bool:
-    if guild.id in allowed_guilds:
-        return True
-    else:
-        return False
+def check_guild(guild: discord.Guild, allowed_guilds: set[int]) -> bool:
+    return guild.id in allowed_guilds
 
 
-async def generic_tasks(LOG: TextIOWrapper, ctx: commands.Context, allowed_guilds: list[int]) -> bool:
+async def generic_tasks(LOG: LogWriter, ctx: commands.Context, allowed_guilds: set[int]) -> bool:
     if (not check_guild(ctx.guild, allowed_guilds)):
         # Write to the log that they attempted to use the command in the guild
-        LOG.write(f'{ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S")} {ctx.message.author} ({ctx.message.author.id}) attempted to use the !{ctx.command} command in guild {ctx.guild.id}.\n')
-        LOG.flush()
+        LOG.write(f'{stamp(ctx.message.created_at)} {ctx.message.author} ({ctx.message.author.id}) attempted to use the !{ctx.command} command in guild {ctx.guild.id}.\n')
         # Let the user know they don't have permission to us it
         embed = discord.Embed(title="Current Server Not Permitted",
                               description="You do not have permission to use commands in this server. Please contact an admin for support.", color=0xFF5733)
@@ -31,7 +28,7 @@ async def generic_tasks(LOG: TextIOWrapper, ctx: commands.Context, allowed_guild
 async def resource_tasks(nation_id: int, ctx: commands.Context) -> tuple[pnwkit.Result, bool]:
     # Get the resource query result
     try:
-        result = pnw.get_query("resource", nation_id)
+        result = await pnw.get_query("resource", nation_id)
     except Exception as inst:
         embed = discord.Embed(
             title=f"{inst.name}", description=f'{inst.message}', color=0xFF5733)
@@ -39,41 +36,6 @@ async def resource_tasks(nation_id: int, ctx: commands.Context) -> tuple[pnwkit.
         return None, True
     return result, False
 
-# A utility function to initialize (or re-define) certain variables
-
-
-def start(dotenv_path: str) -> tuple[list[int], list[int]]:
-    # Initialize the variables to None in case they don't exist in the env file
-    admins: list[int] = []
-    allowed_guilds: list[int] = []
-    errors: list[Exception] = []
-    # Open the env file
-    try:
-        with open(dotenv_path, "r") as f:
-            # Loop through the lines and split them on the equals
-            for line in f.readlines():
-                key, value = line.strip().split("=")
-                # If the key is ADMIN_IDS, then parse it
-                if (key == "ADMIN_IDS" and value != ''):
-                    try:
-                        admins = [int(id) for id in value.split(",")]
-                    except ValueError as inst:
-                        inst.message = "An admin id was not an integer."
-                        errors.append(inst)
-                        pass
-                # If the key is ALLOWED_GUILDS, then parse it
-                if (key == "ALLOWED_GUILDS" and value != ''):
-                    try:
-                        allowed_guilds = [int(id) for id in value.split(",")]
-                    except ValueError as inst:
-                        inst.message = "A guild id was not an integer."
-                        errors.append(inst)
-                        pass
-    except Exception as inst:
-        errors.append(inst)
-
-    return admins, allowed_guilds, errors
-
 # Inspired by code from https://www.reddit.com/r/learnpython/comments/92ne2s/why_does_round05_0/
 
 
@@ -87,9 +49,27 @@ def my_round(num: float, places: int = 2) -> float:
 
 async def attempt_send(destination: discord.User | commands.Context, message: str | discord.Embed):
     try:
-        if type(message) is str:
-            await destination.send(message)
-        else:
-            await destination.send(embed=message)
+        with timed("send"):
+            if type(message) is str:
+                await destination.send(message)
+            else:
+                await destination.send(embed=message)
     except Exception as inst:
         raise inst
+
+
+# A utility function to format a market price, which may be missing if there are no offers
+def format_price(price: int | None) -> str:
+    if price is None:
+        return "No offers"
+    return f'{price: ,d}'
+
+
+# A utility function to get the arguments a command was used with, hiding anything that looks like a key
+def command_args(ctx: commands.Context) -> list[str]:
+    if ctx.command is None:
+        return []
+    # the first arguments are the cog (for commands in a cog) and the context
+    values = ctx.args[2:] if ctx.cog is not None else ctx.args[1:]
+    named = list(zip(ctx.command.clean_params, values)) + list(ctx.kwargs.items())
+    return ["<hidden>" if "key" in name else str(value) for name, value in named]